@@ -1,9 +1,27 @@
 #!/usr/bin/python
 import itertools
+import json
 import sys
+import time
 import re
 import argparse
+import cProfile
+import pstats
 import os
+import io
+import mmap
+import array
+import collections
+import bisect
+import gzip
+import heapq
+import importlib.util
+import queue
+import struct
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 # from collections import defaultdict
 
 
@@ -30,7 +48,12 @@ class Parser():
             usage='''python3 2svfilter.py <command> [options]
 
 Command:  pindel\tConvert pindel output original output files into svfilter acceptable format files
+\t  cache\tParse pindel output original output files once into numpy caches
+\t  index\tIndex the events of pindel output original output files by chromosome and position, for --region
+\t  refilter\tConvert cached pindel files into svfilter acceptable format files, for one or more thresholds
 \t  svdetect\tConvert svdetect output original output files into svfilter acceptable format files
+\t  batch\tConvert the pindel and svdetect output original output files of every sample folder under a root folder
+\t  compare\tCompare converted SVs between male and female and between pindel and svdetect
 '''
         )
         parser.add_argument('command', help='Command to run', nargs='?')
@@ -50,16 +73,35 @@ Command:  pindel\tConvert pindel output original output files into svfilter acce
     def pindel(self):
         parser = argparse.ArgumentParser(
             description='Convert pindel original output file into bed and svfilter ',
-            usage='''python3 radseq_analysis.py pindel -i input_folder [-q] [-n] [-l]
+            usage='''python3 radseq_analysis.py pindel -i input_folder [-q] [-n] [-l] [-s] [-j] [-m] [--max-read-ids] [-z] [-f] [--stats-json] [--profile] [-b] [--region] [--sorted] [--sort-buffer] [--shard-by-chrom]
 
-Options:  -i\t--input-folder\tPath to a folder containing pindel original output file
+Options:  -i\t--input-folder\tPath to a folder containing pindel original output file, - for stdin
 \t  -q\t--reads-q\tset a threshold to filter out reads quality
 \t  -n\t--reads-n\tset a threshold for up|downstream mapped reads numbers
 \t  -l\t--read-len\tset a read length
 \t  -s\t--sv-size\tset a structural size for filtering
+\t  -j\t--jobs\tnumber of pindel files converted in parallel
+\t  -m\t--mmap\tmemory-map each pindel file and parse record-aligned chunks of it with --jobs workers, needs -j
+\t\t--max-read-ids\twrite at most this many read IDs per event, followed by a column with the number of read IDs
+\t  -z\t--bgzip\twrite bgzip compressed outputs, with this many compression threads
+\t  -f\t--force\tconvert every input, also the ones up to date in the manifest
+\t\t--stats-json\twrite lines read, events kept and rejected per SV type and seconds per stage to a JSON file
+\t\t--profile\twrite cProfile stats of this process to a file and print the top functions
+\t  -b\t--bed-file\twith -i -, also write the bed rows to this file
+\t\t--region\tconvert only the events with breakpoints overlapping chr:start-end or chr
+\t\t--sorted\twrite the rows of every output sorted by chromosome and start
+\t\t--sort-buffer\twith --sorted, rows sorted in memory before they are spilled to a temporary file
+\t\t--shard-by-chrom\twrite sorted outputs per chromosome, <name>.<chrom>.<extension>
+
+Input files may be compressed with gzip or bgzip (.gz or .bgz).
+Inputs converted before with the same parameters and unchanged since are skipped, see .2svfilter_manifest.json.
+With -i - one pindel file is read from stdin and its svfilter rows are written to stdout, without -j, -z,
+--stats-json, --sorted or --shard-by-chrom.
+With --region, files indexed by the index command are read only where events of the region are, others are scanned.
+The outputs of a region are written into input_folder/region_<chr>_<start>_<end>.
 ''')
         parser.add_argument('--input-folder', '-i',
-                            help='Path to a folder containing pindel original output file')
+                            help='Path to a folder containing pindel original output file, - for stdin')
         parser.add_argument('--reads-q', '-q',
                             help='set a threshold to filter out reads quality', nargs='?', const=10, default=10, type=int)
         parser.add_argument('--reads-n', '-n',
@@ -68,24 +110,85 @@ Options:  -i\t--input-folder\tPath to a folder containing pindel original output
                             help='set a read length', nargs='?', const=150, default=150, type=int)
         parser.add_argument('--sv-size', '-s',
                             help='set a structural size for filtering', nargs='?', const=50, default=50, type=int)
+        parser.add_argument('--jobs', '-j',
+                            help='number of pindel files converted in parallel', nargs='?', const=os.cpu_count(), default=1, type=int)
+        parser.add_argument('--mmap', '-m',
+                            help='memory-map each pindel file and parse record-aligned chunks of it with --jobs workers', action='store_true')
+        parser.add_argument('--max-read-ids',
+                            help='write at most this many read IDs per event, followed by a column with the number of read IDs', nargs='?', const=100, default=None, type=int)
+        parser.add_argument('--bgzip', '-z',
+                            help='write bgzip compressed outputs, with this many compression threads', nargs='?', const=4, default=0, type=int)
+        parser.add_argument('--force', '-f',
+                            help='convert every input, also the ones up to date in the manifest', action='store_true')
+        parser.add_argument('--stats-json',
+                            help='write lines read, events kept and rejected per SV type and seconds per stage to a JSON file')
+        parser.add_argument('--profile',
+                            help='write cProfile stats of this process to a file and print the top functions')
+        parser.add_argument('--bed-file', '-b',
+                            help='with -i -, also write the bed rows to this file')
+        parser.add_argument('--region',
+                            help='convert only the events with breakpoints overlapping chr:start-end or chr')
+        parser.add_argument('--sorted',
+                            help='write the rows of every output sorted by chromosome and start', action='store_true')
+        parser.add_argument('--sort-buffer',
+                            help='with --sorted, rows sorted in memory before they are spilled to a temporary file', default=1000000, type=int)
+        parser.add_argument('--shard-by-chrom',
+                            help='write sorted outputs per chromosome, <name>.<chrom>.<extension>', action='store_true')
         # parser.add_argument('--output-file', '-o',
         #                     help='Path to output file', nargs='?',
         #                     default='haplotypes_matrix.tsv')
         args = parser.parse_args(sys.argv[2:])
-        if not args.input_folder or not os.path.isdir(args.input_folder):
+        if not args.input_folder or (args.input_folder != '-' and not os.path.isdir(args.input_folder)):
             print('\nError: no valid input folder specified\n')
             parser.print_usage()
             print()
             exit(1)
-        print('reads numbers: {}'.format(args.reads_n))
-        print('reads quality: {}'.format(args.reads_q))
-        print('read length: {}'.format(args.read_len))
-        print('sv size: {}'.format(args.sv_size))
+        if args.sort_buffer < 1:
+            print('\nError: --sort-buffer is the number of rows sorted in memory, it needs to be 1 or more\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        unsupported = stream_unsupported(args) if args.input_folder == '-' else []
+        if unsupported:
+            print('\nError: with -i - the rows are streamed to stdout, {} cannot be used with it\n'.format(', '.join(unsupported)))
+            parser.print_usage()
+            print()
+            exit(1)
+        if args.mmap and args.jobs < 2:
+            print('\nError: --mmap parses chunks in parallel, it needs --jobs of 2 or more\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        region = None
+        if args.region:
+            region = parse_region(args.region)
+            if region is None:
+                print('\nError: --region is not chr:start-end or chr\n')
+                parser.print_usage()
+                print()
+                exit(1)
+        # stdout carries the svfilter rows with -i -
+        log = sys.stderr if args.input_folder == '-' else sys.stdout
+        print('reads numbers: {}'.format(args.reads_n), file=log)
+        print('reads quality: {}'.format(args.reads_q), file=log)
+        print('read length: {}'.format(args.read_len), file=log)
+        print('sv size: {}'.format(args.sv_size), file=log)
         analysis(input_folder=args.input_folder,
                  reads_n=args.reads_n,
                  reads_q=args.reads_q,
                  read_len=args.read_len,
                  sv_size=args.sv_size,
+                 jobs=args.jobs,
+                 use_mmap=args.mmap,
+                 max_read_ids=args.max_read_ids,
+                 bgzip=args.bgzip,
+                 force=args.force,
+                 stats_json=args.stats_json,
+                 profile=args.profile,
+                 output_file=args.bed_file,
+                 region=region,
+                 sort_buffer=args.sort_buffer if args.sorted or args.shard_by_chrom else 0,
+                 shard_by_chrom=args.shard_by_chrom,
                  analysis='pindel')
         # if not args.popmap or not os.path.isfile(args.popmap):
         #     print('\nError: no valid popmap file specified\n')
@@ -93,273 +196,1867 @@ Options:  -i\t--input-folder\tPath to a folder containing pindel original output
         #     print()
         #     exit(1)
 
+    def cache(self):
+        parser = argparse.ArgumentParser(
+            description='Parse pindel original output files once into numpy caches for refilter',
+            usage='''python3 2svfilter.py cache -i input_folder [-j]
+
+Options:  -i\t--input-folder\tPath to a folder containing pindel original output file
+\t  -j\t--jobs\tnumber of pindel files cached in parallel
+''')
+        parser.add_argument('--input-folder', '-i',
+                            help='Path to a folder containing pindel original output file')
+        parser.add_argument('--jobs', '-j',
+                            help='number of pindel files cached in parallel', nargs='?', const=os.cpu_count(), default=1, type=int)
+        args = parser.parse_args(sys.argv[2:])
+        if not args.input_folder or not os.path.isdir(args.input_folder):
+            print('\nError: no valid input folder specified\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        require_numpy()
+        analysis(input_folder=args.input_folder,
+                 jobs=args.jobs,
+                 analysis='cache')
+
+    def index(self):
+        parser = argparse.ArgumentParser(
+            description='Index the events of pindel original output files by chromosome and position for pindel --region',
+            usage='''python3 2svfilter.py index -i input_folder [-b] [-j]
+
+Options:  -i\t--input-folder\tPath to a folder containing pindel original output file
+\t  -b\t--bin-size\tstart a new index block every this many bp of a chromosome
+\t  -j\t--jobs\tnumber of pindel files indexed in parallel
+
+Compressed files are not indexed, pindel --region scans them whole.
+''')
+        parser.add_argument('--input-folder', '-i',
+                            help='Path to a folder containing pindel original output file')
+        parser.add_argument('--bin-size', '-b',
+                            help='start a new index block every this many bp of a chromosome', nargs='?', const=1000000, default=1000000, type=int)
+        parser.add_argument('--jobs', '-j',
+                            help='number of pindel files indexed in parallel', nargs='?', const=os.cpu_count(), default=1, type=int)
+        args = parser.parse_args(sys.argv[2:])
+        if not args.input_folder or not os.path.isdir(args.input_folder):
+            print('\nError: no valid input folder specified\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        analysis(input_folder=args.input_folder,
+                 jobs=args.jobs,
+                 bin_size=args.bin_size,
+                 analysis='index')
+
+    def refilter(self):
+        parser = argparse.ArgumentParser(
+            description='Convert cached pindel files into bed and svfilter, for one or more threshold values',
+            usage='''python3 2svfilter.py refilter -i input_folder [-o] [-q] [-n] [-l] [-s] [--max-read-ids]
+
+Options:  -i\t--input-folder\tPath to a folder containing pindel caches written by cache
+\t  -o\t--output-folder\tPath to write bed and svfilter files into, default the input folder
+\t  -q\t--reads-q\tthresholds to filter out reads quality
+\t  -n\t--reads-n\tthresholds for up|downstream mapped reads numbers
+\t  -l\t--read-len\tread lengths
+\t  -s\t--sv-size\tstructural sizes for filtering
+\t\t--max-read-ids\twrite at most this many read IDs per event, followed by a column with the number of read IDs
+
+With several values for -q, -n, -l or -s every combination is written into its own q*_n*_l*_s* folder.
+''')
+        parser.add_argument('--input-folder', '-i',
+                            help='Path to a folder containing pindel caches written by cache')
+        parser.add_argument('--output-folder', '-o',
+                            help='Path to write bed and svfilter files into, default the input folder')
+        parser.add_argument('--reads-q', '-q',
+                            help='thresholds to filter out reads quality', nargs='+', default=[10], type=int)
+        parser.add_argument('--reads-n', '-n',
+                            help='thresholds for up|downstream mapped reads numbers', nargs='+', default=[3], type=int)
+        parser.add_argument('--read-len', '-l',
+                            help='read lengths', nargs='+', default=[150], type=int)
+        parser.add_argument('--sv-size', '-s',
+                            help='structural sizes for filtering', nargs='+', default=[50], type=int)
+        parser.add_argument('--max-read-ids',
+                            help='write at most this many read IDs per event, followed by a column with the number of read IDs', nargs='?', const=100, default=None, type=int)
+        args = parser.parse_args(sys.argv[2:])
+        if not args.input_folder or not os.path.isdir(args.input_folder):
+            print('\nError: no valid input folder specified\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        require_numpy()
+        analysis(input_folder=args.input_folder,
+                 output_folder=args.output_folder,
+                 reads_n=args.reads_n,
+                 reads_q=args.reads_q,
+                 read_len=args.read_len,
+                 sv_size=args.sv_size,
+                 max_read_ids=args.max_read_ids,
+                 analysis='refilter')
+
     def svdetect(self):
         parser = argparse.ArgumentParser(
             description='Convert svdetect original output file into bed and svfilter ',
-            usage='''python3 radseq_analysis.py svdetect -i input_folder [-n]
+            usage='''python3 radseq_analysis.py svdetect -i input_folder [-o] [-n] [-z] [-f] [--stats-json] [--profile] [--sorted] [--sort-buffer] [--shard-by-chrom]
 
-Options:  -i\t--input-folder\tPath to a folder containing svdetect original output file
+Options:  -i\t--input-folder\tPath to a folder containing svdetect original output file, - for stdin
+\t  -o\t--output-folder\tPath to write the svdetect_<type>.<sex> files into, default the current folder
 \t  -n\t--reads-n\tset a threshold to filter out reads quality
+\t  -z\t--bgzip\twrite bgzip compressed outputs, with this many compression threads
+\t  -f\t--force\tconvert every input, also the ones up to date in the manifest
+\t\t--stats-json\twrite lines read, events kept and rejected per SV type and seconds per stage to a JSON file
+\t\t--profile\twrite cProfile stats of this process to a file and print the top functions
+\t\t--sorted\twrite the rows of every output sorted by chromosome and start
+\t\t--sort-buffer\twith --sorted, rows sorted in memory before they are spilled to a temporary file
+\t\t--shard-by-chrom\twrite sorted outputs per chromosome, <name>.<chrom>.<extension>
+
+Input files may be compressed with gzip or bgzip (.gz or .bgz).
+Inputs converted before with the same parameters and unchanged since are skipped, see .2svfilter_manifest.json.
+With -i - one svdetect file is read from stdin and the svfilter rows of all its SV types are written to stdout,
+without -z, --stats-json, --sorted or --shard-by-chrom.
 ''')
         parser.add_argument('--input-folder', '-i',
-                            help='Path to a folder containing pindel original output file')
+                            help='Path to a folder containing pindel original output file, - for stdin')
+        parser.add_argument('--output-folder', '-o',
+                            help='Path to write the svdetect_<type>.<sex> files into, default the current folder', default='.')
         parser.add_argument('--reads-n', '-n',
                             help='set a threshold up|downstream mapped reads', nargs='?', const=3, default=3, type=int)
+        parser.add_argument('--bgzip', '-z',
+                            help='write bgzip compressed outputs, with this many compression threads', nargs='?', const=4, default=0, type=int)
+        parser.add_argument('--force', '-f',
+                            help='convert every input, also the ones up to date in the manifest', action='store_true')
+        parser.add_argument('--stats-json',
+                            help='write lines read, events kept and rejected per SV type and seconds per stage to a JSON file')
+        parser.add_argument('--profile',
+                            help='write cProfile stats of this process to a file and print the top functions')
+        parser.add_argument('--sorted',
+                            help='write the rows of every output sorted by chromosome and start', action='store_true')
+        parser.add_argument('--sort-buffer',
+                            help='with --sorted, rows sorted in memory before they are spilled to a temporary file', default=1000000, type=int)
+        parser.add_argument('--shard-by-chrom',
+                            help='write sorted outputs per chromosome, <name>.<chrom>.<extension>', action='store_true')
         # parser.add_argument('--output-file', '-o',
         #                     help='Path to output file', nargs='?',
         #                     default='haplotypes_matrix.tsv')
         args = parser.parse_args(sys.argv[2:])
-        print('reads numbers: {}'.format(args.reads_n))
-        if not args.input_folder or not os.path.isdir(args.input_folder):
+        print('reads numbers: {}'.format(args.reads_n), file=sys.stderr if args.input_folder == '-' else sys.stdout)
+        if not args.input_folder or (args.input_folder != '-' and not os.path.isdir(args.input_folder)):
             print('\nError: no valid input folder specified\n')
             parser.print_usage()
             print()
             exit(1)
+        if args.sort_buffer < 1:
+            print('\nError: --sort-buffer is the number of rows sorted in memory, it needs to be 1 or more\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        unsupported = stream_unsupported(args) if args.input_folder == '-' else []
+        if unsupported:
+            print('\nError: with -i - the rows are streamed to stdout, {} cannot be used with it\n'.format(', '.join(unsupported)))
+            parser.print_usage()
+            print()
+            exit(1)
+        if args.input_folder != '-':
+            os.makedirs(args.output_folder, exist_ok=True)
         analysis(input_folder=args.input_folder,
                  reads_n=args.reads_n,
+                 output_folder=args.output_folder,
+                 bgzip=args.bgzip,
+                 force=args.force,
+                 stats_json=args.stats_json,
+                 profile=args.profile,
+                 sort_buffer=args.sort_buffer if args.sorted or args.shard_by_chrom else 0,
+                 shard_by_chrom=args.shard_by_chrom,
                  analysis='svdetect')
 
+    def batch(self):
+        parser = argparse.ArgumentParser(
+            description='Convert the pindel and svdetect original output files of every sample folder under a root folder',
+            usage='''python3 2svfilter.py batch -i input_root [-o] [-q] [-n] [-l] [-s] [-j] [--max-read-ids] [-z] [-f] [--stats-json] [--profile] [--sorted] [--sort-buffer] [--shard-by-chrom]
+
+Options:  -i\t--input-root\tPath to a folder with sample folders containing pindel and/or svdetect original output files
+\t  -o\t--output-root\tPath to write the outputs of every sample into, in <output_root>/<sample>, default the input root
+\t  -q\t--reads-q\tset a threshold to filter out reads quality
+\t  -n\t--reads-n\tset a threshold for up|downstream mapped reads numbers
+\t  -l\t--read-len\tset a read length
+\t  -s\t--sv-size\tset a structural size for filtering
+\t  -j\t--jobs\tnumber of files converted in parallel, default all cpus
+\t\t--max-read-ids\twrite at most this many read IDs per event, followed by a column with the number of read IDs
+\t  -z\t--bgzip\twrite bgzip compressed outputs, with this many compression threads
+\t  -f\t--force\tconvert every input, also the ones up to date in the manifests
+\t\t--stats-json\twrite lines read, events kept and rejected per SV type and seconds per stage to a JSON file
+\t\t--profile\twrite cProfile stats of this process to a file and print the top functions
+\t\t--sorted\twrite the rows of every output sorted by chromosome and start
+\t\t--sort-buffer\twith --sorted, rows sorted in memory before they are spilled to a temporary file
+\t\t--shard-by-chrom\twrite sorted outputs per chromosome, <name>.<chrom>.<extension>
+
+A sample is every folder under the input root holding pindel (*_D, *_INV, *_SI, *_TD) or svdetect (male*.filtered,
+female*.filtered) files, named by its path under the input root. Every sample output folder has its own manifest.
+''')
+        parser.add_argument('--input-root', '-i',
+                            help='Path to a folder with sample folders containing pindel and/or svdetect original output files')
+        parser.add_argument('--output-root', '-o',
+                            help='Path to write the outputs of every sample into, in <output_root>/<sample>, default the input root')
+        parser.add_argument('--reads-q', '-q',
+                            help='set a threshold to filter out reads quality', nargs='?', const=10, default=10, type=int)
+        parser.add_argument('--reads-n', '-n',
+                            help='set a threshold for up|downstream mapped reads numbers', nargs='?', const=3, default=3, type=int)
+        parser.add_argument('--read-len', '-l',
+                            help='set a read length', nargs='?', const=150, default=150, type=int)
+        parser.add_argument('--sv-size', '-s',
+                            help='set a structural size for filtering', nargs='?', const=50, default=50, type=int)
+        parser.add_argument('--jobs', '-j',
+                            help='number of files converted in parallel, default all cpus', nargs='?', const=os.cpu_count(), default=os.cpu_count(), type=int)
+        parser.add_argument('--max-read-ids',
+                            help='write at most this many read IDs per event, followed by a column with the number of read IDs', nargs='?', const=100, default=None, type=int)
+        parser.add_argument('--bgzip', '-z',
+                            help='write bgzip compressed outputs, with this many compression threads', nargs='?', const=4, default=0, type=int)
+        parser.add_argument('--force', '-f',
+                            help='convert every input, also the ones up to date in the manifests', action='store_true')
+        parser.add_argument('--stats-json',
+                            help='write lines read, events kept and rejected per SV type and seconds per stage to a JSON file')
+        parser.add_argument('--profile',
+                            help='write cProfile stats of this process to a file and print the top functions')
+        parser.add_argument('--sorted',
+                            help='write the rows of every output sorted by chromosome and start', action='store_true')
+        parser.add_argument('--sort-buffer',
+                            help='with --sorted, rows sorted in memory before they are spilled to a temporary file', default=1000000, type=int)
+        parser.add_argument('--shard-by-chrom',
+                            help='write sorted outputs per chromosome, <name>.<chrom>.<extension>', action='store_true')
+        args = parser.parse_args(sys.argv[2:])
+        if not args.input_root or not os.path.isdir(args.input_root):
+            print('\nError: no valid input root specified\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        if args.sort_buffer < 1:
+            print('\nError: --sort-buffer is the number of rows sorted in memory, it needs to be 1 or more\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        print('reads numbers: {}'.format(args.reads_n))
+        print('reads quality: {}'.format(args.reads_q))
+        print('read length: {}'.format(args.read_len))
+        print('sv size: {}'.format(args.sv_size))
+        analysis(input_folder=args.input_root,
+                 output_folder=args.output_root,
+                 reads_n=args.reads_n,
+                 reads_q=args.reads_q,
+                 read_len=args.read_len,
+                 sv_size=args.sv_size,
+                 jobs=args.jobs,
+                 max_read_ids=args.max_read_ids,
+                 bgzip=args.bgzip,
+                 force=args.force,
+                 stats_json=args.stats_json,
+                 profile=args.profile,
+                 sort_buffer=args.sort_buffer if args.sorted or args.shard_by_chrom else 0,
+                 shard_by_chrom=args.shard_by_chrom,
+                 analysis='batch')
+
+    def compare(self):
+        parser = argparse.ArgumentParser(
+            description='Compare converted SVs between male and female and between pindel and svdetect',
+            usage='''python3 2svfilter.py compare [-p pindel_folder] [-d svdetect_folder] [-o] [-r] [-w]
+
+Options:  -p\t--pindel-folder\tPath to a folder containing male*.bed and female*.bed files written by pindel
+\t  -d\t--svdetect-folder\tPath to a folder containing svdetect_*.male and svdetect_*.female files written by svdetect
+\t  -o\t--output-file\tPath to output file
+\t  -r\t--overlap\tminimal reciprocal overlap of two matching SVs
+\t  -w\t--window\tmaximal distance between the breakpoints of two matching SVs
+''')
+        parser.add_argument('--pindel-folder', '-p',
+                            help='Path to a folder containing male*.bed and female*.bed files written by pindel')
+        parser.add_argument('--svdetect-folder', '-d',
+                            help='Path to a folder containing svdetect_*.male and svdetect_*.female files written by svdetect')
+        parser.add_argument('--output-file', '-o',
+                            help='Path to output file', nargs='?', default='sv_compare.tsv')
+        parser.add_argument('--overlap', '-r',
+                            help='minimal reciprocal overlap of two matching SVs', nargs='?', const=0.5, default=0.5, type=float)
+        parser.add_argument('--window', '-w',
+                            help='maximal distance between the breakpoints of two matching SVs', nargs='?', const=100, default=100, type=int)
+        args = parser.parse_args(sys.argv[2:])
+        if not args.pindel_folder and not args.svdetect_folder:
+            print('\nError: specify a pindel folder, a svdetect folder or both\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        for folder in (args.pindel_folder, args.svdetect_folder):
+            if folder and not os.path.isdir(folder):
+                print('\nError: {} is not a folder\n'.format(folder))
+                parser.print_usage()
+                print()
+                exit(1)
+        analysis(input_folder=args.pindel_folder,
+                 svdetect_folder=args.svdetect_folder,
+                 output_file=args.output_file,
+                 overlap=args.overlap,
+                 window=args.window,
+                 analysis='compare')
+
+
+def stream_unsupported(args):
+    """Options given in args that write output files or start workers, which -i - does not support."""
+    options = (('--jobs', getattr(args, 'jobs', 1) > 1),
+               ('--bgzip', args.bgzip),
+               ('--stats-json', args.stats_json),
+               ('--sorted', args.sorted),
+               ('--shard-by-chrom', args.shard_by_chrom))
+    return [option for option, given in options if given]
+
+
+def require_numpy():
+    if importlib.util.find_spec('numpy') is None:
+        print('\nError: cache and refilter require numpy, install it with: pip install numpy\n')
+        exit(1)
+
+
+SEPARATOR_LINE = '#' * 100 + '\n'
+SEPARATOR = b'\n' + b'#' * 100
+PINDEL_SUFFIXES = ('_D', '_INV', '_SI', '_TD')
+COMPRESSED_SUFFIXES = ('.gz', '.bgz')
+BUFFER_SIZE = 1 << 20
+MMAP_CHUNK_SIZE = 1 << 25
+SORT_MERGE_FANIN = 16
+# bgzip block layout: at most 0xff00 input bytes per block, so that even incompressible data fits in 64 KiB
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def strip_compression(filename):
+    """Return filename without its .gz or .bgz extension."""
+    for suffix in COMPRESSED_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+class ThreadedGzipReader(io.RawIOBase):
+    """Raw reader of a gzip or bgzip file decompressed by a background thread, zlib releases the GIL meanwhile."""
+
+    def __init__(self, path):
+        self.blocks = queue.Queue(maxsize=16)
+        self.pending = b''
+        self.stopped = False
+        self.thread = threading.Thread(target=self._decompress, args=(path,), daemon=True)
+        self.thread.start()
+
+    def _decompress(self, path):
+        try:
+            with gzip.open(path, 'rb') as file:
+                while not self.stopped:
+                    block = file.read(BUFFER_SIZE)
+                    if not block:
+                        break
+                    self.blocks.put(block)
+        except Exception as error:
+            self.blocks.put(error)
+        self.blocks.put(None)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.pending:
+            block = self.blocks.get()
+            if block is None:
+                # keep answering end of file
+                self.blocks.put(None)
+                return 0
+            if isinstance(block, Exception):
+                raise block
+            self.pending = block
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stopped = True
+            # unblock the thread if it waits on a full queue
+            while self.thread.is_alive():
+                try:
+                    self.blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        super().close()
+
+
+class BgzfWriter(io.RawIOBase):
+    """Raw writer of a bgzip file, blocks are compressed by a pool of threads and written in order."""
+
+    def __init__(self, path, threads=1):
+        self.file = open(path, 'wb')
+        self.pending = bytearray()
+        self.executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        self.batch = BGZF_BLOCK_SIZE * max(threads, 1) * 4
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.pending += data
+        if len(self.pending) >= self.batch:
+            self._write_blocks(len(self.pending) - len(self.pending) % BGZF_BLOCK_SIZE)
+        return len(data)
+
+    def _write_blocks(self, size):
+        blocks = [bytes(self.pending[i:i + BGZF_BLOCK_SIZE]) for i in range(0, size, BGZF_BLOCK_SIZE)]
+        del self.pending[:size]
+        compressed = self.executor.map(bgzf_block, blocks) if self.executor else map(bgzf_block, blocks)
+        for block in compressed:
+            self.file.write(block)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._write_blocks(len(self.pending))
+                self.file.write(BGZF_EOF)
+            finally:
+                self.file.close()
+                if self.executor:
+                    self.executor.shutdown()
+        super().close()
+
+
+def bgzf_block(data):
+    """Compress data into one bgzip block: a gzip member whose extra field holds the block size."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    return (b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' +
+            struct.pack('<H', len(deflated) + 25) + deflated +
+            struct.pack('<II', zlib.crc32(data), len(data)))
+
+
+def open_input(path):
+    """Open a text input, decompressing .gz and .bgz files in a background thread."""
+    if path.endswith(COMPRESSED_SUFFIXES):
+        return io.TextIOWrapper(io.BufferedReader(ThreadedGzipReader(path), BUFFER_SIZE))
+    return open(path, 'r')
+
+
+def output_path(path, bgzip=0):
+    return path + '.gz' if bgzip else path
+
+
+def open_output(path, bgzip=0, sort_buffer=0, shard_by_chrom=False):
+    """Open a text output with a large buffer, with bgzip > 0 as path.gz compressed by that many threads.
+
+    With sort_buffer > 0 the rows are written sorted by chromosome and start, see SortedWriter.
+    """
+    if sort_buffer:
+        return SortedWriter(path, bgzip, sort_buffer, shard_by_chrom)
+    if bgzip:
+        return io.TextIOWrapper(io.BufferedWriter(BgzfWriter(output_path(path, bgzip), bgzip), BUFFER_SIZE))
+    return open(path, 'w', buffering=BUFFER_SIZE)
+
+
+def row_key(row):
+    """Sort key of a bed, svfilter or svdetect row: its chromosome and start, the first two columns."""
+    chrom, start, _ = row.split('\t', 2)
+    return chrom, int(start)
+
+
+class SortedWriter():
+    """A text output whose rows are written sorted by row_key when it is closed, keeping at most sort_buffer rows in memory.
+
+    Every sort_buffer rows are sorted and spilled to a temporary file next to the output, runs are merged SORT_MERGE_FANIN
+    at a time so few files stay open, and on close the remaining runs are merged.
+    Rows with the same key keep their order. With shard_by_chrom, the rows of every chromosome go to a file of their own,
+    <path without extension>.<chrom><extension>.
+    """
+
+    def __init__(self, path, bgzip=0, sort_buffer=1000000, shard_by_chrom=False):
+        self.path = path
+        self.bgzip = bgzip
+        self.sort_buffer = sort_buffer
+        self.shard_by_chrom = shard_by_chrom
+        self.rows = []
+        # (level, file) of the sorted runs spilled, oldest first, see merge_runs
+        self.runs = []
+        self.written = []
+        # the start of a row whose '\n' has not been written yet
+        self.pending = ''
+
+    def write(self, text):
+        # rows end at '\n' only, and a text of many rows is spilled as soon as the buffer is full
+        text = self.pending + text
+        start = 0
+        end = text.find('\n')
+        while end != -1:
+            self.rows.append(text[start:end + 1])
+            if len(self.rows) >= self.sort_buffer:
+                self.spill()
+            start = end + 1
+            end = text.find('\n', start)
+        self.pending = text[start:]
+
+    def run_file(self):
+        return tempfile.TemporaryFile('w+', dir=os.path.dirname(self.path) or '.', prefix='.2svfilter_sort_', newline='\n')
 
-def isa_group_separator(line):
-    return line == '####################################################################################################\n'
+    def spill(self):
+        self.rows.sort(key=row_key)
+        run = self.run_file()
+        run.writelines(self.rows)
+        run.seek(0)
+        self.runs.append((0, run))
+        self.rows = []
+        self.merge_runs()
+
+    def merge_runs(self):
+        """Merge every SORT_MERGE_FANIN runs of one level into one run of the next level, and the oldest
+        SORT_MERGE_FANIN runs into one when 2 * SORT_MERGE_FANIN runs are open.
+
+        Levels only decrease along self.runs, so the runs merged are next to each other and rows with the same key keep
+        their order. Every row is rewritten about once per level, and fewer than 2 * SORT_MERGE_FANIN runs stay open.
+        """
+        while len(self.runs) >= SORT_MERGE_FANIN and self.runs[-SORT_MERGE_FANIN][0] == self.runs[-1][0]:
+            self.runs[-SORT_MERGE_FANIN:] = [self.merge_run(self.runs[-SORT_MERGE_FANIN:])]
+        if len(self.runs) >= 2 * SORT_MERGE_FANIN:
+            self.runs[:SORT_MERGE_FANIN] = [self.merge_run(self.runs[:SORT_MERGE_FANIN])]
+
+    def merge_run(self, runs):
+        merged = self.run_file()
+        merged.writelines(heapq.merge(*(run for _, run in runs), key=row_key))
+        merged.seek(0)
+        for _, run in runs:
+            run.close()
+        return runs[0][0] + 1, merged
+
+    def shard_path(self, chrom):
+        root, extension = os.path.splitext(self.path)
+        return root + '.' + chrom + extension
+
+    def paths(self):
+        """Paths of the files written, after close."""
+        return self.written
+
+    def close(self):
+        if self.pending:
+            self.rows.append(self.pending + '\n')
+            self.pending = ''
+        self.rows.sort(key=row_key)
+        rows = heapq.merge(*(run for _, run in self.runs), self.rows, key=row_key) if self.runs else self.rows
+        if self.shard_by_chrom:
+            for chrom, chrom_rows in itertools.groupby(rows, key=lambda row: row.split('\t', 1)[0]):
+                path = self.shard_path(chrom)
+                with open_output(path, self.bgzip) as file:
+                    file.writelines(chrom_rows)
+                self.written.append(output_path(path, self.bgzip))
+        else:
+            with open_output(self.path, self.bgzip) as file:
+                file.writelines(rows)
+            self.written.append(output_path(self.path, self.bgzip))
+        self.discard()
+
+    def discard(self):
+        for _, run in self.runs:
+            run.close()
+        self.runs = []
+        self.rows = []
+        self.pending = ''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+MANIFEST_NAME = '.2svfilter_manifest.json'
+
+
+class Manifest():
+    """Inputs converted into an output folder: their size and mtime, the parameters used and the outputs written.
+
+    An input is up to date when none of these changed since its conversion, so a re-run only converts new or
+    changed inputs. The manifest is saved after every converted input, an interrupted run resumes where it stopped.
+    Inputs written into the same outputs are one entry: path is then the list of their paths.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.entries = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, 'r') as file:
+                    self.entries = json.load(file)
+            except ValueError:
+                print('Warning: {} is damaged, converting every input again'.format(self.path))
+
+    def key(self, command, path):
+        paths = [path] if isinstance(path, str) else path
+        return command + ':' + '+'.join(os.path.relpath(path, self.folder) for path in paths)
+
+    def input_state(self, path):
+        # a single input is stored as before inputs could share an entry, so older manifests stay valid
+        if isinstance(path, str) or len(path) == 1:
+            return file_state(path if isinstance(path, str) else path[0])
+        return [file_state(input_path) for input_path in path]
+
+    def up_to_date(self, command, path, params):
+        """Return the entry of an input converted with params and not changed since, None otherwise."""
+        entry = self.entries.get(self.key(command, path))
+        if entry is None or entry['params'] != params or entry['input'] != self.input_state(path):
+            return None
+        for output, state in entry['outputs'].items():
+            output = os.path.join(self.folder, output)
+            if not os.path.isfile(output) or file_state(output) != {key: state[key] for key in ('size', 'mtime_ns')}:
+                return None
+        return entry
+
+    def forget(self, command, path):
+        """Drop the entry of an input about to be converted again, and remove the outputs it wrote."""
+        entry = self.entries.pop(self.key(command, path), None)
+        if entry is not None:
+            for output in entry['outputs']:
+                output = os.path.join(self.folder, output)
+                if os.path.isfile(output):
+                    os.remove(output)
+            self.save()
+
+    def record(self, command, path, params, outputs, kept):
+        outputs_state = {}
+        for output in outputs:
+            state = file_state(output)
+            state['crc32'] = '{:08x}'.format(file_crc32(output))
+            outputs_state[os.path.relpath(output, self.folder)] = state
+        # entries of other inputs, or of an earlier set of inputs, that wrote these outputs no longer hold them
+        for key in [key for key, entry in self.entries.items() if not outputs_state.keys().isdisjoint(entry['outputs'])]:
+            del self.entries[key]
+        self.entries[self.key(command, path)] = {'input': self.input_state(path), 'params': params,
+                                                 'outputs': outputs_state, 'kept': kept}
+        self.save()
+
+    def save(self):
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as file:
+            json.dump(self.entries, file, indent=1, sort_keys=True)
+        os.replace(temp, self.path)
+
+
+def file_state(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_crc32(path):
+    crc = 0
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(BUFFER_SIZE), b''):
+            crc = zlib.crc32(block, crc)
+    return crc
 
 
 def pindel2svfilter(input_folder=None,
                     reads_n=None,
                     reads_q=None,
                     read_len=None,
-                    sv_size=None):
-    for filename in os.listdir(input_folder):
-        if filename.endswith(('_D', '_INV', '_SI', '_TD')) and os.stat(os.path.join(input_folder, filename)).st_size != 0:
-            print(filename)
-            file = open(os.path.join(input_folder, filename), 'r')
-            filtername = filename + '.filter'
-            bedname = filename + '.bed'
-            svfilter_file = open(os.path.join(input_folder, filtername), 'w')
-            bed_file = open(os.path.join(input_folder, bedname), 'w')
-            for key, group in itertools.groupby(file, isa_group_separator):
-                # print(key,list(group))  # uncomment to see what itertools.groupby does.
-                if not key:
-                    # print('yes')
-                    chrom_name = ''
-                    upstream_pos = []
-                    downstream_pos = []
-                    reads_number = 0
-                    reads_ID = []
-                    svtype = ''
-                    up_reads = 0
-                    down_reads = 0
-                    bp_start = ''
-                    bp_end = ''
-                    sv_s = 0
-                    for item in group:
-                        if re.match(r'^\d', item):
-                            # print(info)
-                            split = re.split(r'\s+', item)[:-1]
-                            bp_start = split[9]
-                            bp_end = split[10]
-                            chrom_name = split[7]
-                            sv_s = int(split[2])
-                            # print(split[2], split[3])
-                            if split[1] == 'D':
-                                # print(split)
-                                svtype = 'DELETION'
-                            elif split[1] == 'INV':
-                                # print(split)
-                                svtype = 'IVERSION'
-                            elif split[1] == 'I':
-                                # print(split)
-                                # print(sv_s)
-                                svtype = 'SHORT_INSERT'
-                            elif split[1] == 'TD':
-                                # print(split)
-                                svtype = 'TANDEM_DUPLI'
-                        if svtype == 'DELETION':
-                            if re.match(r'^\w', item, re.I):
-                                # print('ref')
-                                split = re.split(r'\s+', item)[:-1]
-                                pass
-                            elif re.match(r'^\s+[A-Z]', item, re.I):
-                                # print('reads_info')
-                                split = re.split(r'\s+', item)[1:-1]
-                                # print(split[4])
-                                if re.match(r'\d+', split[4]):
-                                    if int(split[4]) >= reads_q:
-                                        reads_number += 1
-                                        if split[2] == '+':
-                                            up_reads += 1
-                                            reads_ID.append(split[6][1:-2])
-                                            upstream_pos.extend([int(split[3]) + read_len / 2, int(split[3]) - read_len / 2])
-                                        elif split[2] == '-':
-                                            down_reads += 1
-                                            reads_ID.append(split[6][1:-2])
-                                            downstream_pos.extend([int(split[3]) + read_len / 2, int(split[3]) - read_len / 2])
-                                else:
-                                    if int(split[3]) >= reads_q:
-                                        reads_number += 1
-                                        if split[1] == '+':
-                                            up_reads += 1
-                                            reads_ID.append(split[5][1:-2])
-                                            upstream_pos.extend([int(split[2]) + read_len / 2, int(split[2]) - read_len / 2])
-                                        elif split[1] == '-':
-                                            down_reads += 1
-                                            reads_ID.append(split[5][1:-2])
-                                            downstream_pos.extend([int(split[2]) + read_len / 2, int(split[2]) - read_len / 2])
-                        if svtype == 'SHORT_INSERT':
-                            if re.match(r'^\w', item, re.I):
-                                # print('ref')
-                                split = re.split(r'\s+', item)[:-1]
-                                pass
-                            elif re.match(r'^\s+[A-Z]', item, re.I):
-                                # print('reads_info')
-                                split = re.split(r'\s+', item)[1:-1]
-                                # print(split[1], split[2], split[3], split[5])
-                                if int(split[3]) >= reads_q:
-                                    # print(split[1], split[2], split[3], split[5])
-                                    reads_number += 1
-                                    if split[1] == '+':
-                                        up_reads += 1
-                                        reads_ID.append(split[5][1:-2])
-                                        upstream_pos.extend([int(split[2]) + read_len / 2, int(split[2]) - read_len / 2])
-                                        # print(str(int(split[2]) + read_len / 2))
-                                    elif split[1] == '-':
-                                        down_reads += 1
-                                        reads_ID.append(split[5][1:-2])
-                                        downstream_pos.extend([int(split[2]) + read_len / 2, int(split[2]) - read_len / 2])
-                                    # else:
-                                    #     print('out of consideration')
-                        if svtype == 'IVERSION':
-                            if re.match(r'^\w', item, re.I):
-                                # print('ref')
-                                split = re.split(r'\s+', item)[:-1]
-                                pass
-                            elif re.match(r'^\s+[A-Z]', item, re.I):
-                                # print('reads_info')
-                                split = re.split(r'\s+', item)[1:-1]
-                                # print(split[2], split[3], split[5])
-                                if int(split[3]) >= reads_q:
-                                    reads_number += 1
-                                    if split[1] == '+':
-                                        up_reads += 1
-                                        reads_ID.append(split[5][1:-2])
-                                        upstream_pos.extend([int(split[2]) + read_len / 2, int(split[2]) - read_len / 2])
-                                    elif split[1] == '-':
-                                        down_reads += 1
-                                        reads_ID.append(split[5][1:-2])
-                                        downstream_pos.extend([int(split[2]) + read_len / 2, int(split[2]) - read_len / 2])
-                                    # else:
-                                    #     print('out of consideration')
-                        if svtype == 'TANDEM_DUPLI':
-                            if re.match(r'^\w', item, re.I):
-                                # print('ref')
-                                split = re.split(r'\s+', item)[:-1]
-                                pass
-                            elif re.match(r'^\s+[A-Z]', item, re.I):
-                                # print('reads')
-                                split = re.split(r'\s+', item)[1:-1]
-                                pass
-                            elif re.match(r'^\s+[+,-]', item):
-                                # print('reads_info')
-                                split = re.split(r'\s+', item)[1:-1]
-                                # print(split)
-                                if int(split[2]) >= reads_q:
-                                    reads_number += 1
-                                    if split[0] == '+':
-                                        up_reads += 1
-                                        reads_ID.append(split[4][1:-2])
-                                        # print(type(read_len))
-                                        # print(type(reads_n))
-                                        # print(type(reads_q))
-                                        # print(type(sv_size))
-                                        # print(type(int(split[1])))
-                                        upstream_pos.extend([int(split[1]) + read_len / 2, int(split[1]) - read_len / 2])
-                                    elif split[0] == '-':
-                                        down_reads += 1
-                                        reads_ID.append(split[4][1:-2])
-                                        downstream_pos.extend([int(split[1]) + read_len / 2, int(split[1]) - read_len / 2])
-                                    # else:
-                                    #     print('out of consideration')
-                            else:
-                                pass
-                    # print(down_reads, up_reads, sv_s, reads_q, reads_n, read_len, sv_size)
-                    if down_reads >= reads_n and up_reads >= reads_n and sv_s >= sv_size:
-                        # pass
-                        reads_id = ','.join(reads_ID)
-                        upstream_pos_s = str(min(upstream_pos))[:-2]
-                        upstream_pos_e = str(max(upstream_pos))[:-2]
-                        downstream_pos_s = str(min(downstream_pos))[:-2]
-                        downstream_pos_e = str(max(downstream_pos))[:-2]
-                        # print(reads_id, upstream_pos_s, upstream_pos_e, downstream_pos_s, downstream_pos_e)
-                        svfilter_file.write(chrom_name + '\t' + upstream_pos_s + '\t' + upstream_pos_e + '\t' + 'F' + '\t' + chrom_name + '\t' + downstream_pos_s + '\t' + downstream_pos_e + '\t' + 'R' + '\t' + str(reads_number) + '\t' + reads_id + '\t' + svtype + '\n')
-                        bed_file.write(chrom_name + '\t' + bp_start + '\t' + bp_end + '\t' + svtype + '\t' + str(sv_s) + '\n')
-                    else:
-                        pass
-                        # print(down_reads, up_reads, sv_s)
+                    sv_size=None,
+                    jobs=1,
+                    use_mmap=False,
+                    max_read_ids=None,
+                    bgzip=0,
+                    force=False,
+                    stats_json=None,
+                    region=None,
+                    sort_buffer=0,
+                    shard_by_chrom=False):
+    start = time.perf_counter()
+    output_folder = input_folder
+    params = {'reads_n': reads_n, 'reads_q': reads_q, 'read_len': read_len, 'sv_size': sv_size,
+              'max_read_ids': max_read_ids, 'bgzip': bool(bgzip)}
+    if region is not None:
+        params['region'] = format_region(region)
+        # outputs of a region go to a folder of their own, with its own manifest, the outputs of the whole files stay
+        output_folder = os.path.join(input_folder, region_folder(region))
+        os.makedirs(output_folder, exist_ok=True)
+    manifest = Manifest(output_folder)
+    params.update(sort_params(sort_buffer, shard_by_chrom))
+    sort = (sort_buffer, shard_by_chrom)
+    results = {}
+    files_stats = {}
+    filenames = []
+    for filename in pindel_filenames(input_folder):
+        path = os.path.join(input_folder, filename)
+        entry = None if force else manifest.up_to_date('pindel', path, params)
+        if entry is not None:
+            results[filename] = entry['kept']
+            files_stats[filename] = {'up_to_date': True}
+        else:
+            manifest.forget('pindel', path)
+            filenames.append(filename)
+
+    def done(filename, kept, outputs, file_stats):
+        results[filename] = kept
+        files_stats[filename] = file_stats
+        manifest.record('pindel', os.path.join(input_folder, filename), params, outputs, kept)
+
+    stats = stats_json is not None
+    if jobs > 1 and use_mmap:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for filename in filenames:
+                done(*pindel_file2svfilter(input_folder, filename, reads_n, reads_q, read_len, sv_size, max_read_ids, bgzip,
+                                           stats, executor=executor, chunks=jobs * 4, region=region, sort=sort,
+                                           output_folder=output_folder, window=jobs * 2))
+    elif jobs > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(filenames))) as executor:
+            futures = [executor.submit(pindel_file2svfilter, input_folder, filename, reads_n, reads_q, read_len, sv_size, max_read_ids,
+                                       bgzip, stats, region=region, sort=sort, output_folder=output_folder)
+                       for filename in filenames]
+            for future in as_completed(futures):
+                done(*future.result())
+    else:
+        for filename in filenames:
+            done(*pindel_file2svfilter(input_folder, filename, reads_n, reads_q, read_len, sv_size, max_read_ids, bgzip, stats,
+                                       region=region, sort=sort, output_folder=output_folder))
+    if stats:
+        write_stats_json(stats_json, 'pindel', params, files_stats, time.perf_counter() - start)
+    print('{} files converted, {} up to date'.format(len(filenames), len(results) - len(filenames)))
+    # workers finish in any order, report in filename order so the summary is the same for every --jobs
+    for filename in sorted(results):
+        print('{}\t{}'.format(filename, results[filename]))
+
+
+def sort_params(sort_buffer, shard_by_chrom):
+    """Manifest parameters of the output order, none for the default input order."""
+    params = {}
+    if sort_buffer:
+        params['sorted'] = True
+    if shard_by_chrom:
+        params['shard_by_chrom'] = True
+    return params
+
+
+def write_stats_json(path, command, params, files_stats, seconds):
+    """Write the run report: parameters, wall seconds and the stats of every input, sorted by filename."""
+    with open(path, 'w') as file:
+        json.dump({'command': command, 'params': params, 'seconds': seconds,
+                   'files': {filename: files_stats[filename] for filename in sorted(files_stats)}},
+                  file, indent=1, sort_keys=True)
+        file.write('\n')
+
+
+def pindel_filenames(input_folder):
+    """Return the non-empty pindel output files of a folder, largest first."""
+    # largest files first, so one huge _D file does not start last and keep a single worker busy at the end
+    return sorted((filename for filename in os.listdir(input_folder)
+                   if strip_compression(filename).endswith(PINDEL_SUFFIXES) and os.stat(os.path.join(input_folder, filename)).st_size != 0),
+                  key=lambda filename: (-os.stat(os.path.join(input_folder, filename)).st_size, filename))
+
+
+def pindel_file2svfilter(input_folder, filename, reads_n, reads_q, read_len, sv_size, max_read_ids=None, bgzip=0,
+                         stats=False, executor=None, chunks=1, region=None, sort=(0, False), output_folder=None, window=2):
+    """Convert one pindel file into <filename>.filter and <filename>.bed, in output_folder or else next to it.
+
+    Return (filename, number of kept events, paths of the outputs, stats dict or None).
+
+    With an executor and chunks > 1 the file is memory-mapped, cut into record-aligned chunks and the chunks
+    are parsed by the executor workers; their output is written back in file order, with at most window chunks
+    submitted and not written yet. Compressed files are always read as one stream.
+
+    With a region, only the byte ranges its index gives for the region are parsed, when the file has an up to date
+    index; otherwise the whole file is, and in both cases only the events overlapping the region are written.
+
+    sort is (sort_buffer, shard_by_chrom) of open_output.
+    """
+    start = time.perf_counter()
+    path = os.path.join(input_folder, filename)
+    output = os.path.join(output_folder or input_folder, strip_compression(filename))
+    ranges = None
+    if region is not None:
+        ranges = pindel_index_ranges(path, region)
+        if ranges is None:
+            print('{}: no up to date index, scanning the whole file for the region'.format(filename))
+    elif executor is not None and chunks > 1 and not filename.endswith(COMPRESSED_SUFFIXES):
+        # chunks of at most about MMAP_CHUNK_SIZE, a worker holds the output of one chunk until it is written
+        bounds = pindel_chunks(path, max(chunks, os.stat(path).st_size // MMAP_CHUNK_SIZE + 1))
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+    file_stats = None
+    if stats:
+        # bytes read from the file on disk: the index ranges of a region, else all of it, compressed as it is stored
+        file_stats = {'bytes': sum(end - offset for offset, end in ranges) if ranges is not None else os.stat(path).st_size}
+    with open_output(output + '.filter', bgzip, *sort) as svfilter_file, open_output(output + '.bed', bgzip, *sort) as bed_file:
+        if ranges is not None:
+            kept = 0
+            arguments = ((path, offset, end, reads_n, reads_q, read_len, sv_size, max_read_ids, stats, region)
+                         for offset, end in ranges)
+            if executor is not None:
+                results = window_map(executor, pindel_chunk2svfilter, arguments, window)
+            else:
+                results = itertools.starmap(pindel_chunk2svfilter, arguments)
+            for svfilter_text, bed_text, chunk_kept, chunk_stats in results:
+                svfilter_file.write(svfilter_text)
+                bed_file.write(bed_text)
+                kept += chunk_kept
+                if stats:
+                    # seconds of the chunks are summed over the workers
+                    add_stats(file_stats, chunk_stats)
+        else:
+            with open_input(path) as file:
+                kept = pindel_lines2svfilter(file, svfilter_file, bed_file, reads_n, reads_q, read_len, sv_size, max_read_ids,
+                                             file_stats, region)
+    if stats:
+        file_stats.setdefault('seconds', {})['wall'] = time.perf_counter() - start
+    if sort[0]:
+        outputs = svfilter_file.paths() + bed_file.paths()
+    else:
+        outputs = [output_path(output + '.filter', bgzip), output_path(output + '.bed', bgzip)]
+    return filename, kept, outputs, file_stats
+
+
+def window_map(executor, function, arguments, window):
+    """Yield function(*args) for every args of arguments in order, computed by the executor.
+
+    At most window calls are submitted and not yielded yet; the next one is submitted once the caller is done with the
+    oldest result, so a slow consumer keeps at most window results in memory.
+    """
+    arguments = iter(arguments)
+    pending = collections.deque(executor.submit(function, *args) for args in itertools.islice(arguments, window))
+    while pending:
+        yield pending.popleft().result()
+        for args in itertools.islice(arguments, 1):
+            pending.append(executor.submit(function, *args))
+
+
+def pindel_chunks(path, chunks):
+    """Return the byte offsets cutting a pindel file into about `chunks` pieces, each cut at the start of a separator line."""
+    size = os.stat(path).st_size
+    step = size // chunks + 1
+    bounds = [0]
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = step
+        while pos < size:
+            offset = mm.find(SEPARATOR, pos - 1)
+            if offset == -1:
+                break
+            end = offset + len(SEPARATOR)
+            # a longer run of '#' is not a separator
+            if mm[end:end + 1] == b'\n' or mm[end:end + 2] == b'\r\n':
+                bounds.append(offset + 1)
+                pos = offset + 1 + step
+            else:
+                pos = end + 1
+    bounds.append(size)
+    return bounds
+
+
+class MmapRange(io.RawIOBase):
+    """The bytes [start, end) of a memory map as a raw stream, read in place without copying the range first."""
+
+    def __init__(self, mm, start, end):
+        self.mm = mm
+        self.pos = start
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.end - self.pos)
+        if size <= 0:
+            return 0
+        buffer[:size] = self.mm[self.pos:self.pos + size]
+        self.pos += size
+        return size
+
+
+def pindel_chunk2svfilter(path, start, end, reads_n, reads_q, read_len, sv_size, max_read_ids=None, stats=False,
+                          region=None):
+    """Convert the bytes [start, end) of a pindel file, return (filter text, bed text, number of kept events, stats)."""
+    svfilter_file = io.StringIO()
+    bed_file = io.StringIO()
+    chunk_stats = {} if stats else None
+    with open(path, 'rb') as raw, mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # decode exactly like open(path, 'r') does, so the chunks give the same lines as the serial path
+        with io.TextIOWrapper(io.BufferedReader(MmapRange(mm, start, end), BUFFER_SIZE)) as file:
+            kept = pindel_lines2svfilter(file, svfilter_file, bed_file, reads_n, reads_q, read_len, sv_size, max_read_ids,
+                                         chunk_stats, region)
+    return svfilter_file.getvalue(), bed_file.getvalue(), kept, chunk_stats
+
+
+INDEX_SUFFIX = '.idx'
+# a separator line and the header line of the event following it
+PINDEL_HEADER = re.compile(rb'^#{100}\r?\n(\d[^\n]*)', re.MULTILINE)
+REGION = re.compile(r'^([^:\s]+)(?::([\d,]+)-([\d,]+))?$')
+
+
+def parse_region(text):
+    """Return (chrom, start, end) of a chr:start-end or chr region, None when text is neither."""
+    match = REGION.match(text)
+    if match is None:
+        return None
+    if match.group(2) is None:
+        return match.group(1), 0, sys.maxsize
+    start, end = int(match.group(2).replace(',', '')), int(match.group(3).replace(',', ''))
+    if start > end:
+        return None
+    return match.group(1), start, end
+
+
+def format_region(region):
+    chrom, start, end = region
+    return chrom if (start, end) == (0, sys.maxsize) else '{}:{}-{}'.format(chrom, start, end)
+
+
+def region_folder(region):
+    """Name of the folder the outputs of a region are written into, e.g. region_chr2_100000_900000."""
+    return 'region_' + re.sub(r'[^\w.]', '_', format_region(region))
+
+
+def index_pindel_file(input_folder, filename, bin_size=1000000):
+    """Index the events of a pindel file into <filename>.idx, return (filename, number of blocks).
+
+    A block is a run of consecutive events of one chromosome starting in the same bin_size bp bin. The index holds
+    for every block its chromosome, lowest start and highest end breakpoint, and byte offset and length in the file;
+    blocks start at a separator line, so every block can be parsed on its own.
+    """
+    path = os.path.join(input_folder, filename)
+    state = file_state(path)
+    blocks = []
+    key = None
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for match in PINDEL_HEADER.finditer(mm):
+            fields = match.group(1).split()
+            chrom = fields[7].decode()
+            bp_start = int(fields[9])
+            bp_end = int(fields[10])
+            if (chrom, bp_start // bin_size) != key:
+                key = (chrom, bp_start // bin_size)
+                # the first block also holds whatever precedes the first separator
+                offset = match.start() if blocks else 0
+                if blocks:
+                    blocks[-1][4] = offset - blocks[-1][3]
+                blocks.append([chrom, bp_start, bp_end, offset, 0])
+            else:
+                block = blocks[-1]
+                if bp_start < block[1]:
+                    block[1] = bp_start
+                if bp_end > block[2]:
+                    block[2] = bp_end
+        if blocks:
+            blocks[-1][4] = len(mm) - blocks[-1][3]
+    index_path = os.path.join(input_folder, filename + INDEX_SUFFIX)
+    with open(index_path + '.tmp', 'w') as file:
+        json.dump({'source': filename, 'source_stat': state, 'bin_size': bin_size, 'blocks': blocks}, file)
+    os.replace(index_path + '.tmp', index_path)
+    return filename, len(blocks)
+
+
+def index_pindel(input_folder=None, jobs=1, bin_size=1000000):
+    filenames = [filename for filename in pindel_filenames(input_folder) if not filename.endswith(COMPRESSED_SUFFIXES)]
+    results = {}
+    if jobs > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(filenames))) as executor:
+            for filename, blocks in executor.map(index_pindel_file, itertools.repeat(input_folder), filenames,
+                                                 itertools.repeat(bin_size)):
+                results[filename] = blocks
+    else:
+        for filename in filenames:
+            filename, blocks = index_pindel_file(input_folder, filename, bin_size)
+            results[filename] = blocks
+    for filename in sorted(results):
+        print('{}\t{}'.format(filename, results[filename]))
+
+
+def pindel_index_ranges(path, region):
+    """Return the [start, end) byte ranges of a pindel file holding every event that may overlap region.
+
+    The ranges come from the index of the file; None when it has none or changed since it was indexed.
+    """
+    index_path = path + INDEX_SUFFIX
+    if path.endswith(COMPRESSED_SUFFIXES) or not os.path.isfile(index_path):
+        return None
+    try:
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+    except ValueError:
+        return None
+    if index['source_stat'] != file_state(path):
+        return None
+    chrom, start, end = region
+    ranges = []
+    for block_chrom, block_start, block_end, offset, length in index['blocks']:
+        if block_chrom == chrom and block_start <= end and block_end >= start:
+            # neighbouring blocks are read as one range
+            if ranges and ranges[-1][1] == offset:
+                ranges[-1][1] = offset + length
+            else:
+                ranges.append([offset, offset + length])
+    return ranges
+
+
+def region_records(records, region):
+    """Yield the records with breakpoints overlapping region."""
+    chrom, start, end = region
+    for record in records:
+        if record.chrom == chrom and int(record.bp_start) <= end and int(record.bp_end) >= start:
+            yield record
+
+
+class PindelRecord():
+    """One pindel event with its supporting reads of good enough mapping quality.
+
+    Only the extremes of the up|downstream read positions are kept, so a record has the same size however deep the event is.
+    """
+
+    __slots__ = ('chrom', 'svtype', 'size', 'bp_start', 'bp_end',
+                 'reads_number', 'up_reads', 'down_reads', 'up_min', 'up_max', 'down_min', 'down_max', 'read_ids',
+                 'low_q_up_reads', 'low_q_down_reads')
+
+    def __init__(self, chrom, svtype, size, bp_start, bp_end,
+                 reads_number, up_reads, down_reads, up_min, up_max, down_min, down_max, read_ids,
+                 low_q_up_reads=0, low_q_down_reads=0):
+        self.chrom = chrom
+        self.svtype = svtype
+        self.size = size
+        self.bp_start = bp_start
+        self.bp_end = bp_end
+        self.reads_number = reads_number
+        self.up_reads = up_reads
+        self.down_reads = down_reads
+        self.up_min = up_min
+        self.up_max = up_max
+        self.down_min = down_min
+        self.down_max = down_max
+        self.read_ids = read_ids
+        self.low_q_up_reads = low_q_up_reads
+        self.low_q_down_reads = low_q_down_reads
+
+    def svfilter_row(self, read_len, read_ids_count=False):
+        # read ranges are the mapped positions -+ half read length, printed without the '.0' of the float
+        half = abs(read_len / 2)
+        row = (self.chrom + '\t' + str(self.up_min - half)[:-2] + '\t' + str(self.up_max + half)[:-2] + '\tF\t' +
+               self.chrom + '\t' + str(self.down_min - half)[:-2] + '\t' + str(self.down_max + half)[:-2] + '\tR\t' +
+               str(self.reads_number) + '\t' + ','.join(self.read_ids) + '\t' + self.svtype)
+        if read_ids_count:
+            return row + '\t' + str(self.up_reads + self.down_reads) + '\n'
+        return row + '\n'
+
+    def bed_row(self):
+        return self.chrom + '\t' + self.bp_start + '\t' + self.bp_end + '\t' + self.svtype + '\t' + str(self.size) + '\n'
+
+
+PINDEL_SVTYPES = {'D': 'DELETION', 'INV': 'IVERSION', 'I': 'SHORT_INSERT', 'TD': 'TANDEM_DUPLI'}
+
+# For every SV type: the characters a supporting read line starts with (after its indent), and the columns
+# (strand, position, mapping quality, read name) of that line. DELETION reads split by the deletion have one more
+# sequence column, they are recognized by a number in column 4. TANDEM_DUPLI reads print their sequence on a line of
+# its own, followed by a line starting with the strand.
+LETTERS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
+DIGITS = frozenset('0123456789')
+PINDEL_READ_LAYOUTS = {
+    'DELETION': (LETTERS, (1, 2, 3, 5), (2, 3, 4, 6)),
+    'SHORT_INSERT': (LETTERS, (1, 2, 3, 5), None),
+    'IVERSION': (LETTERS, (1, 2, 3, 5), None),
+    'TANDEM_DUPLI': (frozenset('+,-'), (0, 1, 2, 4), None),
+}
+
+
+def pindel_events(file):
+    """Yield (header fields, svtype, reads) for every event of a pindel output file, in file order.
+
+    The header fields are the split header line of the event, reads is a list of (strand, position, mapping quality,
+    read name) of its supporting reads, found and split as PINDEL_READ_LAYOUTS says. Positions are left as strings.
+    """
+    header = None
+    svtype = ''
+    lead = columns = split_columns = None
+    reads = []
+    for line in file:
+        first = line[:1]
+        if first.isspace():
+            if lead is None:
+                continue
+            fields = line.split()
+            if not fields or fields[0][0] not in lead:
+                continue
+            if split_columns is not None and fields[4][:1] in DIGITS:
+                strand_col, pos_col, q_col, id_col = split_columns
+            else:
+                strand_col, pos_col, q_col, id_col = columns
+            reads.append((fields[strand_col], fields[pos_col], int(fields[q_col]), fields[id_col][1:-2]))
+        elif first in DIGITS:
+            header = line.split()
+            svtype = PINDEL_SVTYPES.get(header[1], svtype)
+            lead, columns, split_columns = PINDEL_READ_LAYOUTS.get(svtype, (None, None, None))
+        elif line == SEPARATOR_LINE:
+            if header is not None:
+                yield header, svtype, reads
+            header = None
+            svtype = ''
+            lead = columns = split_columns = None
+            reads = []
+    if header is not None:
+        yield header, svtype, reads
+
+
+def parse_pindel(file, reads_q, max_read_ids=None):
+    """Yield a PindelRecord for every event of a pindel output file, counting reads of mapping quality >= reads_q.
+
+    With max_read_ids only the first max_read_ids read IDs of an event are kept.
+    """
+    ids_cap = float('inf') if max_read_ids is None else max_read_ids
+    for header, svtype, reads in pindel_events(file):
+        reads_number = up_reads = down_reads = low_q_up = low_q_down = 0
+        up_min = up_max = down_min = down_max = None
+        read_ids = []
+        for strand, pos, q, read_id in reads:
+            if q >= reads_q:
+                reads_number += 1
+                if strand == '+':
+                    up_reads += 1
+                    if up_reads + down_reads <= ids_cap:
+                        read_ids.append(read_id)
+                    pos = int(pos)
+                    if up_reads == 1:
+                        up_min = up_max = pos
+                    elif pos < up_min:
+                        up_min = pos
+                    elif pos > up_max:
+                        up_max = pos
+                elif strand == '-':
+                    down_reads += 1
+                    if up_reads + down_reads <= ids_cap:
+                        read_ids.append(read_id)
+                    pos = int(pos)
+                    if down_reads == 1:
+                        down_min = down_max = pos
+                    elif pos < down_min:
+                        down_min = pos
+                    elif pos > down_max:
+                        down_max = pos
+            elif strand == '+':
+                low_q_up += 1
+            elif strand == '-':
+                low_q_down += 1
+        yield PindelRecord(header[7], svtype, int(header[2]), header[9], header[10],
+                           reads_number, up_reads, down_reads, up_min, up_max, down_min, down_max, read_ids,
+                           low_q_up, low_q_down)
+
+
+def pindel_records(file, reads_n=3, reads_q=10, sv_size=50, max_read_ids=None, region=None):
+    """Yield the PindelRecord of each event of the pindel lines of file passing the filters, in file order.
+
+    record.svfilter_row(read_len) and record.bed_row() are the rows pindel2svfilter writes for it.
+    """
+    records = parse_pindel(file, reads_q, max_read_ids)
+    if region is not None:
+        records = region_records(records, region)
+    for record in records:
+        if record.down_reads >= reads_n and record.up_reads >= reads_n and record.size >= sv_size:
+            yield record
+
+
+def pindel_lines2svfilter(file, svfilter_file, bed_file, reads_n, reads_q, read_len, sv_size, max_read_ids=None,
+                          stats=None, region=None):
+    """Convert pindel lines into svfilter and bed rows, return the number of kept events.
+
+    With a stats dict, lines read, events seen, kept and rejected per SV type and seconds per stage are added to it.
+    With a region, events not overlapping it are left out, also of the stats.
+    """
+    kept = 0
+    read_ids_count = max_read_ids is not None
+    if stats is None:
+        for record in pindel_records(file, reads_n, reads_q, sv_size, max_read_ids, region):
+            svfilter_file.write(record.svfilter_row(read_len, read_ids_count))
+            bed_file.write(record.bed_row())
+            kept += 1
+        return kept
+    clock = time.perf_counter
+    start = clock()
+    seconds = stats.setdefault('seconds', {})
+    write = 0
+    records = parse_pindel(timed_lines(file, stats), reads_q, max_read_ids)
+    if region is not None:
+        records = region_records(records, region)
+    for record in records:
+        svtype = stats.setdefault('svtypes', {}).setdefault(record.svtype, {})
+        svtype['events'] = svtype.get('events', 0) + 1
+        svtype['low_quality_reads'] = (svtype.get('low_quality_reads', 0) +
+                                       record.low_q_up_reads + record.low_q_down_reads)
+        if record.down_reads >= reads_n and record.up_reads >= reads_n and record.size >= sv_size:
+            tick = clock()
+            svfilter_file.write(record.svfilter_row(read_len, read_ids_count))
+            bed_file.write(record.bed_row())
+            write += clock() - tick
+            kept += 1
+            svtype['kept'] = svtype.get('kept', 0) + 1
+            continue
+        # the first gate failing: sv size, else read quality when the low quality reads would have been enough
+        if record.size < sv_size:
+            reason = 'sv_size'
+        elif record.up_reads + record.low_q_up_reads >= reads_n and record.down_reads + record.low_q_down_reads >= reads_n:
+            reason = 'reads_q'
+        else:
+            reason = 'reads_n'
+        rejected = svtype.setdefault('rejected', {})
+        rejected[reason] = rejected.get(reason, 0) + 1
+    total = clock() - start
+    seconds['write'] = seconds.get('write', 0) + write
+    seconds['parse'] = seconds.get('parse', 0) + total - write - stats['read_seconds']
+    seconds['read'] = seconds.get('read', 0) + stats.pop('read_seconds')
+    return kept
+
+
+def timed_lines(file, stats):
+    """Yield the lines of file, counting them into stats['lines'] and the time spent reading into stats['read_seconds']."""
+    clock = time.perf_counter
+    stats.setdefault('lines', 0)
+    stats['read_seconds'] = 0
+    while True:
+        start = clock()
+        lines = file.readlines(BUFFER_SIZE)
+        stats['read_seconds'] += clock() - start
+        if not lines:
+            return
+        stats['lines'] += len(lines)
+        yield from lines
+
+
+def add_stats(total, stats):
+    """Add the numbers of a (nested) stats dict into total."""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            add_stats(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def pindel_columns(file):
+    """Parse every supporting read of a pindel file, whatever its mapping quality, into flat columns.
+
+    Reads are listed event after event, strands are coded 1 for '+', 2 for '-' and 0 otherwise,
+    read names and chromosome names are interned into tables and referenced by their index.
+    """
+    chroms = {}
+    svtypes = {}
+    read_names = {}
+    event_chrom = array.array('q')
+    event_svtype = array.array('q')
+    event_size = array.array('q')
+    event_bp_start = array.array('q')
+    event_bp_end = array.array('q')
+    read_event = array.array('q')
+    read_strand = array.array('b')
+    read_pos = array.array('q')
+    read_q = array.array('q')
+    read_id = array.array('q')
+    for event, (header, svtype, reads) in enumerate(pindel_events(file)):
+        event_chrom.append(chroms.setdefault(header[7], len(chroms)))
+        event_svtype.append(svtypes.setdefault(svtype, len(svtypes)))
+        event_size.append(int(header[2]))
+        event_bp_start.append(int(header[9]))
+        event_bp_end.append(int(header[10]))
+        for strand, pos, q, name in reads:
+            read_event.append(event)
+            read_q.append(q)
+            if strand == '+' or strand == '-':
+                read_strand.append(1 if strand == '+' else 2)
+                read_pos.append(int(pos))
+                read_id.append(read_names.setdefault(name, len(read_names)))
+            else:
+                read_strand.append(0)
+                read_pos.append(0)
+                read_id.append(-1)
+    return {'chroms': list(chroms), 'svtypes': list(svtypes), 'read_names': list(read_names),
+            'event_chrom': event_chrom, 'event_svtype': event_svtype, 'event_size': event_size,
+            'event_bp_start': event_bp_start, 'event_bp_end': event_bp_end,
+            'read_event': read_event, 'read_strand': read_strand, 'read_pos': read_pos, 'read_q': read_q, 'read_id': read_id}
+
+
+def cache_pindel_file(input_folder, filename):
+    """Parse a pindel file once into <filename>.cache.npz (without .gz), return (filename, number of events)."""
+    import numpy as np
+    path = os.path.join(input_folder, filename)
+    stat = os.stat(path)
+    with open_input(path) as file:
+        columns = pindel_columns(file)
+    arrays = {name: np.frombuffer(values, dtype=values.typecode) for name, values in columns.items()
+              if isinstance(values, array.array)}
+    np.savez(os.path.join(input_folder, strip_compression(filename) + '.cache.npz'),
+             source=np.array(filename),
+             source_stat=np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64),
+             chroms=np.array(columns['chroms'], dtype=str),
+             svtypes=np.array(columns['svtypes'], dtype=str),
+             # one '\n' separated blob, an array of python strings would need pickle
+             read_names=np.frombuffer('\n'.join(columns['read_names']).encode(), dtype=np.uint8),
+             **arrays)
+    return filename, len(columns['event_size'])
+
+
+def cache_pindel(input_folder=None, jobs=1):
+    filenames = pindel_filenames(input_folder)
+    results = {}
+    if jobs > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(filenames))) as executor:
+            for filename, events in executor.map(cache_pindel_file, itertools.repeat(input_folder), filenames):
+                results[filename] = events
+    else:
+        for filename in filenames:
+            filename, events = cache_pindel_file(input_folder, filename)
+            results[filename] = events
+    for filename in sorted(results):
+        print('{}\t{}'.format(filename, results[filename]))
+
+
+def refilter_cache(cache, svfilter_file, bed_file, reads_n, reads_q, read_len, sv_size, max_read_ids=None):
+    """Write the events of a loaded pindel cache passing the thresholds, return the number of kept events.
+
+    Rows are the same as the ones pindel_lines2svfilter writes from the pindel file itself.
+    """
+    import numpy as np
+    read_event = cache['read_event']
+    read_strand = cache['read_strand']
+    read_pos = cache['read_pos']
+    event_size = cache['event_size']
+    events = len(event_size)
+    good = cache['read_q'] >= reads_q
+    up = good & (read_strand == 1)
+    down = good & (read_strand == 2)
+    reads_number = np.bincount(read_event[good], minlength=events)
+    up_reads = np.bincount(read_event[up], minlength=events)
+    down_reads = np.bincount(read_event[down], minlength=events)
+    keep = np.flatnonzero((down_reads >= reads_n) & (up_reads >= reads_n) & (event_size >= sv_size))
+    if len(keep) == 0:
+        return 0
+
+    def extremes(mask):
+        # reads are sorted by event, so the reads of an event are one contiguous run
+        event = read_event[mask]
+        pos = read_pos[mask]
+        lowest = np.zeros(events, dtype=np.int64)
+        highest = np.zeros(events, dtype=np.int64)
+        if len(event):
+            starts = np.flatnonzero(np.r_[True, event[1:] != event[:-1]])
+            lowest[event[starts]] = np.minimum.reduceat(pos, starts)
+            highest[event[starts]] = np.maximum.reduceat(pos, starts)
+        return lowest[keep].tolist(), highest[keep].tolist()
+
+    up_min, up_max = extremes(up)
+    down_min, down_max = extremes(down)
+    supporting = up | down
+    support_event = read_event[supporting]
+    support_id = cache['read_id'][supporting].tolist()
+    id_starts = np.searchsorted(support_event, keep, 'left').tolist()
+    id_ends = np.searchsorted(support_event, keep, 'right').tolist()
+    if max_read_ids is not None:
+        id_ends = [min(end, start + max_read_ids) for start, end in zip(id_starts, id_ends)]
+    read_names = bytes(cache['read_names']).decode().split('\n')
+    chroms = cache['chroms'].tolist()
+    svtypes = cache['svtypes'].tolist()
+    event_chrom = cache['event_chrom'][keep].tolist()
+    event_svtype = cache['event_svtype'][keep].tolist()
+    read_ids_count = max_read_ids is not None
+    for i, event in enumerate(keep.tolist()):
+        record = PindelRecord(chroms[event_chrom[i]], svtypes[event_svtype[i]], int(event_size[event]),
+                              str(cache['event_bp_start'][event]), str(cache['event_bp_end'][event]),
+                              int(reads_number[event]), int(up_reads[event]), int(down_reads[event]),
+                              up_min[i], up_max[i], down_min[i], down_max[i],
+                              [read_names[j] for j in support_id[id_starts[i]:id_ends[i]]])
+        svfilter_file.write(record.svfilter_row(read_len, read_ids_count))
+        bed_file.write(record.bed_row())
+    return len(keep)
+
+
+def refilter_pindel(input_folder=None,
+                    output_folder=None,
+                    reads_n=None,
+                    reads_q=None,
+                    read_len=None,
+                    sv_size=None,
+                    max_read_ids=None):
+    """Write .filter and .bed files from the pindel caches of a folder for every combination of the given thresholds.
+
+    reads_n, reads_q, read_len and sv_size are lists; with more than one combination every combination is written
+    into its own q<reads_q>_n<reads_n>_l<read_len>_s<sv_size> folder inside output_folder.
+    """
+    import numpy as np
+    output_folder = output_folder or input_folder
+    combinations = list(itertools.product(reads_q, reads_n, read_len, sv_size))
+    for cache_name in sorted(filename for filename in os.listdir(input_folder) if filename.endswith('.cache.npz')):
+        filename = cache_name[:-len('.cache.npz')]
+        with np.load(os.path.join(input_folder, cache_name)) as npz:
+            cache = {name: npz[name] for name in npz.files}
+        source = os.path.join(input_folder, str(cache['source']))
+        if os.path.isfile(source):
+            stat = os.stat(source)
+            if cache['source_stat'].tolist() != [stat.st_size, stat.st_mtime_ns]:
+                print('Warning: {} changed since it was cached, run cache again'.format(filename))
+        for q, n, length, size in combinations:
+            folder = output_folder
+            if len(combinations) > 1:
+                folder = os.path.join(output_folder, 'q{}_n{}_l{}_s{}'.format(q, n, length, size))
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, filename + '.filter'), 'w') as svfilter_file, \
+                    open(os.path.join(folder, filename + '.bed'), 'w') as bed_file:
+                kept = refilter_cache(cache, svfilter_file, bed_file, n, q, length, size, max_read_ids)
+            print('{}\t{}\t{}'.format(os.path.relpath(folder, output_folder), filename, kept))
+
+
+# svdetect SV type -> (output file, orientations when the pairs start with R, orientations otherwise,
+#                      read count column the link is filtered on)
+# INV_TRANSLOC links are only kept when column 18 fails the threshold and column 17 passes it.
+SVDETECT_TYPES = {
+    'DELETION': ('deletion', ('R', 'F'), ('F', 'R'), 18),
+    'INVERSION': ('inversion', ('R', 'R'), ('F', 'F'), 18),
+    'LARGE_DUPLI': ('large_dupli', ('R', 'F'), ('F', 'R'), 18),
+    'INV_DUPLI': ('inv_dupli', ('R', 'R'), ('F', 'F'), 18),
+    'DUPLICATION': ('duplication', ('R', 'R'), ('F', 'F'), 18),
+    'TRANSLOC': ('transloc', ('R', 'F'), ('F', 'R'), 18),
+    'SMALL_DUPLI': ('small_dupli', ('R', 'F'), ('F', 'R'), 18),
+    'INV_TRANSLOC': ('inv_transloc', ('R', 'R'), ('F', 'F'), 17),
+}
+LEADING_DIGIT = re.compile(r'\d')
+
+
+class OutputFiles():
+    """Output files opened on their first row and all closed, in name order, when the block ends."""
+
+    def __init__(self, folder, suffix, bgzip=0, sort_buffer=0, shard_by_chrom=False):
+        self.folder = folder
+        self.suffix = suffix
+        self.bgzip = bgzip
+        self.sort_buffer = sort_buffer
+        self.shard_by_chrom = shard_by_chrom
+        self.files = {}
+
+    def path(self, name):
+        return os.path.join(self.folder, 'svdetect_' + name + '.' + self.suffix)
+
+    def paths(self):
+        if self.sort_buffer:
+            return [path for name in sorted(self.files) for path in self.files[name].paths()]
+        return [output_path(self.path(name), self.bgzip) for name in sorted(self.files)]
+
+    def write(self, name, text):
+        file = self.files.get(name)
+        if file is None:
+            file = self.files[name] = open_output(self.path(name), self.bgzip, self.sort_buffer, self.shard_by_chrom)
+        file.write(text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for name in sorted(self.files):
+            self.files[name].close()
+        return False
 
 
 def svdetect2svfilter(input_folder=None,
-                      reads_n=None):
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".filtered"):
+                      reads_n=None,
+                      output_folder='.',
+                      bgzip=0,
+                      force=False,
+                      stats_json=None,
+                      sort_buffer=0,
+                      shard_by_chrom=False):
+    start = time.perf_counter()
+    manifest = Manifest(output_folder)
+    params = {'reads_n': reads_n, 'bgzip': bool(bgzip)}
+    params.update(sort_params(sort_buffer, shard_by_chrom))
+    results = {}
+    files_stats = {}
+    converted = files = 0
+    # the files of one sex all write svdetect_<type>.<sex>, they are converted and recorded together
+    for suffix, filenames in svdetect_groups(svdetect_filenames(input_folder)):
+        name = '+'.join(filenames)
+        paths = [os.path.join(input_folder, filename) for filename in filenames]
+        files += len(filenames)
+        entry = None if force else manifest.up_to_date('svdetect', paths, params)
+        if entry is not None:
+            results[name] = entry['kept']
+            files_stats[name] = {'up_to_date': True}
+            continue
+        manifest.forget('svdetect', paths)
+        name, kept, outputs, files_stats[name] = svdetect_file2svfilter(
+            input_folder, filenames, suffix, reads_n, output_folder, bgzip, stats_json is not None, sort_buffer,
+            shard_by_chrom)
+        manifest.record('svdetect', paths, params, outputs, kept)
+        results[name] = kept
+        converted += len(filenames)
+    if stats_json is not None:
+        write_stats_json(stats_json, 'svdetect', params, files_stats, time.perf_counter() - start)
+    print('{} files converted, {} up to date'.format(converted, files - converted))
+    for filename in sorted(results):
+        print('{}\t{}'.format(filename, results[filename]))
+
+
+def svdetect_groups(filenames):
+    """Return (suffix, filenames) of (filename, suffix) pairs, the files of every suffix together in filename order."""
+    groups = {}
+    for filename, suffix in filenames:
+        groups.setdefault(suffix, []).append(filename)
+    return sorted(groups.items())
+
+
+def svdetect_filenames(input_folder):
+    """Return (filename, male or female) of the svdetect output files of a folder, in filename order."""
+    filenames = []
+    for filename in sorted(os.listdir(input_folder)):
+        if strip_compression(filename).endswith(".filtered"):
             if filename.startswith("male"):
-                suffix = "male"
+                filenames.append((filename, "male"))
             elif filename.startswith("female"):
-                suffix = "female"
-            deletion_file = open("svdetect_deletion." + suffix, 'w')
-            large_dupli_file = open("svdetect_large_dupli." + suffix, 'w')
-            inversion_file = open("svdetect_inversion." + suffix, 'w')
-            inv_dupli_file = open("svdetect_inv_dupli." + suffix, 'w')
-            duplication_file = open("svdetect_duplication." + suffix, 'w')
-            transloc_file = open("svdetect_transloc." + suffix, 'w')
-            inv_transloc_file = open("svdetect_inv_transloc." + suffix, 'w')
-            small_dupli_file = open("svdetect_small_dupli." + suffix, 'w')
-            file = open(input_folder + filename, 'r')
-            for line in file:
-                info = re.split(r'\s+', line[:-1])
-                # print(info)
-                if re.match(r'(\d).*?', info[18]) and int(re.match(r'(\d).*?', info[18]).group(1)) >= reads_n:
-                    if info[16] == "DELETION":
-                        if re.match(r'\(R.*?', info[8]):
-                            deletion_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            deletion_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                    elif info[16] == "INVERSION":
-                        if re.match(r'\(R.*?', info[8]):
-                            inversion_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            inversion_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                    elif info[16] == "LARGE_DUPLI":
-                        if re.match(r'\(R.*?', info[8]):
-                            large_dupli_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            large_dupli_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                    elif info[16] == "INV_DUPLI":
-                        if re.match(r'\(R.*?', info[8]):
-                            inv_dupli_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            inv_dupli_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                    elif info[16] == "DUPLICATION":
-                        if re.match(r'\(R.*?', info[8]):
-                            duplication_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            duplication_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-
-                    elif info[16] == "TRANSLOC":
-                        if re.match(r'\(R.*?', info[8]):
-                            transloc_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            transloc_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                    elif info[16] == "SMALL_DUPLI":
-                        if re.match(r'\(R.*?', info[8]):
-                            small_dupli_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            small_dupli_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                elif re.match(r'(\d).*?', info[17]) and int(re.match(r'(\d).*?', info[17]).group(1)) >= reads_n:
-                    if info[16] == "INV_TRANSLOC":
-                        if re.match(r'\(R.*?', info[8]):
-                            inv_transloc_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'R' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'R' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
-                        else:
-                            inv_transloc_file.write(info[0] + '\t' + info[1] + '\t' + info[2] + '\t' + 'F' + '\t' + info[3] + '\t' + info[4] + '\t' + info[5] + '\t' + 'F' + '\t' + info[6] + '\t' + info[7][1:-1] + '\t' + info[16] + '\n')
+                filenames.append((filename, "female"))
+            else:
+                print('Warning: {} does not start with male or female, skipped'.format(filename))
+    return filenames
+
+
+def svdetect_file2svfilter(input_folder, filenames, suffix, reads_n, output_folder='.', bgzip=0, stats=False,
+                           sort_buffer=0, shard_by_chrom=False):
+    """Split the links of the svdetect files of one sex into svdetect_<type>.<suffix> files, in the order of filenames.
+
+    Return (the filenames joined by '+', number of kept links, paths of the outputs, stats dict or None).
+    With stats, links seen, kept and rejected per SV type, lines read and seconds per stage are counted.
+    """
+    start = time.perf_counter()
+    paths = [os.path.join(input_folder, filename) for filename in filenames]
+    kept = 0
+    rows = {}
+    file_stats = {'bytes': sum(os.stat(path).st_size for path in paths)} if stats else None
+    counts = {} if stats else None
+    read = write = 0
+    with OutputFiles(output_folder, suffix, bgzip, sort_buffer, shard_by_chrom) as outputs:
+        for path in paths:
+            with open_input(path) as file:
+                for name, row in svdetect_rows(timed_lines(file, file_stats) if stats else file, reads_n, counts):
+                    # collect rows per output and hand them over in large batches
+                    batch = rows.setdefault(name, [])
+                    batch.append(row)
+                    kept += 1
+                    if len(batch) >= 4096:
+                        tick = time.perf_counter()
+                        outputs.write(name, ''.join(batch))
+                        write += time.perf_counter() - tick
+                        batch.clear()
+            if stats:
+                read += file_stats.pop('read_seconds')
+        tick = time.perf_counter()
+        for name in sorted(rows):
+            if rows[name]:
+                outputs.write(name, ''.join(rows[name]))
+    write += time.perf_counter() - tick
+    if stats:
+        total = time.perf_counter() - start
+        file_stats['seconds'] = {'read': read, 'parse': total - read - write, 'write': write, 'wall': total}
+        file_stats['svtypes'] = {svtype: {'events': links, 'kept': kept_links,
+                                          'rejected': {'reads_n': low_reads, 'count_column': other_column}}
+                                 for svtype, (links, kept_links, low_reads, other_column) in counts.items()}
+    return '+'.join(filenames), kept, outputs.paths(), file_stats
+
+
+def svdetect_rows(file, reads_n=3, counts=None):
+    """Yield (output name, svfilter row) for the svdetect links of file passing the read count filter.
+
+    The output name is the <type> of the svdetect_<type>.<sex> file the row goes to. With a counts dict, each SV type
+    gets [links, kept, rejected by the read counts, passing the read count column of another SV type] in it.
+    """
+    for line in file:
+        info = line.split()
+        if counts is not None:
+            count = counts.get(info[16])
+            if count is None:
+                count = counts[info[16]] = [0, 0, 0, 0]
+            count[0] += 1
+        match = LEADING_DIGIT.match(info[18])
+        if match and int(match.group()) >= reads_n:
+            count_col = 18
+        else:
+            match = LEADING_DIGIT.match(info[17])
+            if match and int(match.group()) >= reads_n:
+                count_col = 17
+            else:
+                if counts is not None:
+                    count[2] += 1
+                continue
+        svtype = SVDETECT_TYPES.get(info[16])
+        if svtype is None or svtype[3] != count_col:
+            if counts is not None:
+                count[3] += 1
+            continue
+        if counts is not None:
+            count[1] += 1
+        name, reverse, forward, _ = svtype
+        up, down = reverse if info[8].startswith('(R') else forward
+        yield name, '\t'.join((info[0], info[1], info[2], up, info[3], info[4], info[5], down,
+                               info[6], info[7][1:-1], info[16])) + '\n'
+
+
+def batch_samples(input_root, output_root):
+    """Return (sample, folder, pindel filenames, svdetect (filename, suffix)) of every folder under input_root with inputs.
+
+    The sample is the path of the folder relative to input_root; output_root is not searched when it is under input_root.
+    """
+    samples = []
+    skip = os.path.realpath(output_root)
+    for folder, dirs, _ in os.walk(input_root):
+        dirs[:] = sorted(name for name in dirs if os.path.realpath(os.path.join(folder, name)) != skip)
+        pindel_files = pindel_filenames(folder)
+        svdetect_files = svdetect_filenames(folder)
+        if pindel_files or svdetect_files:
+            samples.append((os.path.relpath(folder, input_root), folder, pindel_files, svdetect_files))
+    return samples
+
+
+def batch2svfilter(input_root=None,
+                   output_root=None,
+                   reads_n=None,
+                   reads_q=None,
+                   read_len=None,
+                   sv_size=None,
+                   jobs=1,
+                   max_read_ids=None,
+                   bgzip=0,
+                   force=False,
+                   stats_json=None,
+                   sort_buffer=0,
+                   shard_by_chrom=False):
+    """Convert the pindel and svdetect files of every sample folder under input_root into output_root/<sample>.
+
+    All inputs go to one pool of jobs workers, the largest first. The svdetect files of one sample and sex are one task
+    and one manifest entry, as they write the same outputs. Every sample output folder has its own manifest, kept by
+    this process.
+    """
+    start = time.perf_counter()
+    output_root = output_root or input_root
+    pindel_params = {'reads_n': reads_n, 'reads_q': reads_q, 'read_len': read_len, 'sv_size': sv_size,
+                     'max_read_ids': max_read_ids, 'bgzip': bool(bgzip)}
+    pindel_params.update(sort_params(sort_buffer, shard_by_chrom))
+    svdetect_params = {'reads_n': reads_n, 'bgzip': bool(bgzip)}
+    svdetect_params.update(sort_params(sort_buffer, shard_by_chrom))
+    params = {'pindel': pindel_params, 'svdetect': svdetect_params}
+    stats = stats_json is not None
+    manifests = {}
+    # per sample and caller: [files, converted, kept events]
+    summary = {}
+    files_stats = {}
+    tasks = []
+    for sample, folder, pindel_files, svdetect_files in batch_samples(input_root, output_root):
+        output_folder = os.path.normpath(os.path.join(output_root, sample))
+        os.makedirs(output_folder, exist_ok=True)
+        manifest = manifests[sample] = Manifest(output_folder)
+        # a manifest entry and a task: one pindel file, or the svdetect files of one sex
+        for caller, filenames, suffix in ([('pindel', [filename], None) for filename in pindel_files] +
+                                          [('svdetect', filenames, suffix)
+                                           for suffix, filenames in svdetect_groups(svdetect_files)]):
+            paths = [os.path.join(folder, filename) for filename in filenames]
+            # pindel entries are keyed on the path, like the ones of the pindel command
+            path = paths if caller == 'svdetect' else paths[0]
+            row = summary.setdefault((sample, caller), [0, 0, 0])
+            row[0] += len(filenames)
+            entry = None if force else manifest.up_to_date(caller, path, params[caller])
+            if entry is not None:
+                row[2] += entry['kept']
+                files_stats[os.path.join(sample, '+'.join(filenames))] = {'up_to_date': True}
+                continue
+            manifest.forget(caller, path)
+            size = sum(os.stat(input_path).st_size for input_path in paths)
+            if caller == 'svdetect':
+                tasks.append((size, sample, path, len(filenames), caller, svdetect_file2svfilter,
+                              (folder, filenames, suffix, reads_n, output_folder, bgzip, stats, sort_buffer, shard_by_chrom), {}))
+            else:
+                tasks.append((size, sample, path, 1, caller, pindel_file2svfilter,
+                              (folder, filenames[0], reads_n, reads_q, read_len, sv_size, max_read_ids, bgzip, stats),
+                              {'sort': (sort_buffer, shard_by_chrom), 'output_folder': output_folder}))
+    # largest inputs first, so the pool does not end waiting on one big file started last
+    tasks.sort(key=lambda task: -task[0])
+
+    def done(sample, path, files, caller, name, kept, outputs, file_stats):
+        manifests[sample].record(caller, path, params[caller], outputs, kept)
+        row = summary[(sample, caller)]
+        row[1] += files
+        row[2] += kept
+        files_stats[os.path.join(sample, name)] = file_stats
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+            futures = {executor.submit(function, *args, **kwargs): (sample, path, files, caller)
+                       for _, sample, path, files, caller, function, args, kwargs in tasks}
+            for future in as_completed(futures):
+                done(*futures[future], *future.result())
+    else:
+        for _, sample, path, files, caller, function, args, kwargs in tasks:
+            done(sample, path, files, caller, *function(*args, **kwargs))
+    if stats:
+        write_stats_json(stats_json, 'batch', params, files_stats, time.perf_counter() - start)
+    converted = sum(row[1] for row in summary.values())
+    print('{} samples, {} files converted, {} up to date'.format(
+        len(manifests), converted, sum(row[0] for row in summary.values()) - converted))
+    print('sample\tcaller\tfiles\tconverted\tkept')
+    totals = {}
+    for (sample, caller), row in sorted(summary.items()):
+        print('{}\t{}\t{}\t{}\t{}'.format(sample, caller, *row))
+        total = totals.setdefault(caller, [0, 0, 0])
+        for i, value in enumerate(row):
+            total[i] += value
+    for caller, row in sorted(totals.items()):
+        print('total\t{}\t{}\t{}\t{}'.format(caller, *row))
+
+
+# SV types of both callers grouped into the classes compared across callers
+SV_CLASSES = {
+    'DELETION': 'DEL',
+    'IVERSION': 'INV',
+    'INVERSION': 'INV',
+    'SHORT_INSERT': 'INS',
+    'TANDEM_DUPLI': 'DUP',
+    'LARGE_DUPLI': 'DUP',
+    'SMALL_DUPLI': 'DUP',
+    'DUPLICATION': 'DUP',
+    'INV_DUPLI': 'DUP',
+    'TRANSLOC': 'TRA',
+    'INV_TRANSLOC': 'TRA',
+}
+SEXES = ('male', 'female')
+CALLERS = ('pindel', 'svdetect')
+
+
+def load_sv_calls(pindel_folder=None, svdetect_folder=None):
+    """Load pindel .bed files and svdetect_*.<sex> files into {(caller, sex): [(chrom, start, end, svtype), ...]}.
+
+    pindel files are assigned to a sex by their male|female prefix. svdetect links span from the end of the first
+    read cluster to the start of the second one, links between two chromosomes are left out.
+    """
+    calls = {(caller, sex): [] for caller in CALLERS for sex in SEXES}
+    if pindel_folder:
+        for filename in sorted(os.listdir(pindel_folder)):
+            if not strip_compression(filename).endswith('.bed'):
+                continue
+            sex = 'female' if filename.startswith('female') else 'male' if filename.startswith('male') else None
+            if sex is None:
+                print('Warning: {} does not start with male or female, skipped'.format(filename))
+                continue
+            with open_input(os.path.join(pindel_folder, filename)) as file:
+                for line in file:
+                    info = line.split('\t')
+                    calls['pindel', sex].append((info[0], int(info[1]), int(info[2]), info[3]))
+    if svdetect_folder:
+        for filename in sorted(os.listdir(svdetect_folder)):
+            sex = strip_compression(filename).rsplit('.', 1)[-1]
+            if not filename.startswith('svdetect_') or sex not in SEXES:
+                continue
+            with open_input(os.path.join(svdetect_folder, filename)) as file:
+                for line in file:
+                    info = line.rstrip('\n').split('\t')
+                    if info[0] != info[4]:
+                        continue
+                    end, start = int(info[2]), int(info[5])
+                    calls['svdetect', sex].append((info[0], min(start, end), max(start, end), info[10]))
+    return calls
+
+
+class SVIndex():
+    """SV calls grouped by chromosome and SV class, and within a group into buckets of calls of about the same length.
+
+    A bucket holds the calls with the same bit length of end - start, sorted by start for binary search. A call
+    overlapping a query starts at most the longest call of its bucket before the query, so one long call only widens
+    the scan of its own bucket, and buckets of lengths that cannot match are skipped.
+    """
+
+    def __init__(self, calls):
+        groups = {}
+        for i, (chrom, start, end, svtype) in enumerate(calls):
+            buckets = groups.setdefault((chrom, SV_CLASSES.get(svtype, svtype)), {})
+            buckets.setdefault(max(end - start, 0).bit_length(), []).append((start, end, i))
+        self.groups = {}
+        for key, buckets in groups.items():
+            self.groups[key] = []
+            for bits in sorted(buckets):
+                bucket = sorted(buckets[bits])
+                lengths = [end - start for start, end, i in bucket]
+                self.groups[key].append(([start for start, end, i in bucket], [end for start, end, i in bucket],
+                                         [i for start, end, i in bucket], min(lengths), max(lengths)))
+
+    def matches(self, chrom, start, end, svtype, overlap, window):
+        """Return the indices of the calls with a reciprocal overlap >= overlap or both breakpoints within window."""
+        group = self.groups.get((chrom, SV_CLASSES.get(svtype, svtype)))
+        if group is None:
+            return []
+        found = []
+        length = end - start
+        # lengths a match can have: a reciprocal overlap, or both breakpoints moved by at most window
+        shortest = min(overlap * length, length - 2 * window)
+        longest = max(length / overlap if overlap > 0 else float('inf'), length + 2 * window)
+        for starts, ends, ids, bucket_shortest, bucket_longest in group:
+            if bucket_longest < shortest or bucket_shortest > longest:
+                continue
+            # an overlapping call starts at most bucket_longest before start, a call within the window at most window before
+            lo = bisect.bisect_left(starts, start - max(bucket_longest, window))
+            hi = bisect.bisect_right(starts, max(end, start + window))
+            for j in range(lo, hi):
+                other_start = starts[j]
+                other_end = ends[j]
+                if abs(other_start - start) <= window and abs(other_end - end) <= window:
+                    found.append(ids[j])
+                    continue
+                shared = min(end, other_end) - max(start, other_start)
+                if shared > 0 and shared >= overlap * length and shared >= overlap * (other_end - other_start):
+                    found.append(ids[j])
+        return sorted(found)
+
+
+def compare_sv_calls(pindel_folder=None,
+                     svdetect_folder=None,
+                     output_file=None,
+                     overlap=0.5,
+                     window=100):
+    """Label every call as shared between the sexes or sex-specific, and as found by both callers or caller-specific."""
+    calls = load_sv_calls(pindel_folder, svdetect_folder)
+    indexes = {key: SVIndex(key_calls) for key, key_calls in calls.items()}
+    summary = []
+    with open(output_file, 'w') as out:
+        out.write('#chrom\tstart\tend\tsvtype\tcaller\tsex\tsex_status\tcaller_status\tmatches\n')
+        for caller in CALLERS:
+            other_caller = CALLERS[1 - CALLERS.index(caller)]
+            for sex in SEXES:
+                other_sex = SEXES[1 - SEXES.index(sex)]
+                sex_shared = caller_shared = 0
+                for chrom, start, end, svtype in calls[caller, sex]:
+                    matched = [key for key in ((caller, other_sex), (other_caller, sex), (other_caller, other_sex))
+                               if indexes[key].matches(chrom, start, end, svtype, overlap, window)]
+                    in_other_sex = (caller, other_sex) in matched or (other_caller, other_sex) in matched
+                    in_other_caller = (other_caller, sex) in matched
+                    sex_shared += in_other_sex
+                    caller_shared += in_other_caller
+                    out.write('{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(
+                        chrom, start, end, svtype, caller, sex,
+                        'shared' if in_other_sex else sex + '-specific',
+                        'both' if in_other_caller else caller + '-only',
+                        ','.join(key_caller + ':' + key_sex for key_caller, key_sex in matched) or '.'))
+                total = len(calls[caller, sex])
+                summary.append((caller, sex, total, sex_shared, total - sex_shared, caller_shared, total - caller_shared))
+    print('caller\tsex\tcalls\tshared\tsex-specific\tboth callers\tcaller-specific')
+    for row in summary:
+        print('\t'.join(str(value) for value in row))
+
+
+def stream2svfilter(analysis, reads_n, reads_q, read_len, sv_size, max_read_ids=None, bed_file=None, region=None):
+    """Convert one pindel or svdetect file read from stdin into svfilter rows written to stdout."""
+    try:
+        if analysis == 'svdetect':
+            for name, row in svdetect_rows(sys.stdin, reads_n):
+                sys.stdout.write(row)
+        else:
+            read_ids_count = max_read_ids is not None
+            bed = open_output(bed_file) if bed_file else None
+            for record in pindel_records(sys.stdin, reads_n, reads_q, sv_size, max_read_ids, region):
+                sys.stdout.write(record.svfilter_row(read_len, read_ids_count))
+                if bed:
+                    bed.write(record.bed_row())
+            if bed:
+                bed.close()
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # the next command of the pipeline stopped reading, keep the interpreter from failing on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        exit(1)
 
 
 def analysis(input_folder=None,
@@ -367,11 +2064,53 @@ def analysis(input_folder=None,
              reads_q=None,
              read_len=None,
              sv_size=None,
+             jobs=1,
+             use_mmap=False,
+             max_read_ids=None,
+             output_folder=None,
+             svdetect_folder=None,
+             output_file=None,
+             overlap=0.5,
+             window=100,
+             bgzip=0,
+             force=False,
+             stats_json=None,
+             profile=None,
+             bin_size=1000000,
+             region=None,
+             sort_buffer=0,
+             shard_by_chrom=False,
              analysis=None):
-    if analysis == 'pindel':
-        pindel2svfilter(input_folder, reads_n, reads_q, read_len, sv_size)
+    if profile:
+        # profiles this process only, worker processes of --jobs are not included
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if input_folder == '-':
+        stream2svfilter(analysis, reads_n, reads_q, read_len, sv_size, max_read_ids, output_file, region)
+    elif analysis == 'pindel':
+        pindel2svfilter(input_folder, reads_n, reads_q, read_len, sv_size, jobs, use_mmap, max_read_ids, bgzip, force,
+                        stats_json, region, sort_buffer, shard_by_chrom)
+    elif analysis == 'cache':
+        cache_pindel(input_folder, jobs)
+    elif analysis == 'index':
+        index_pindel(input_folder, jobs, bin_size)
+    elif analysis == 'refilter':
+        refilter_pindel(input_folder, output_folder, reads_n, reads_q, read_len, sv_size, max_read_ids)
+    elif analysis == 'batch':
+        batch2svfilter(input_folder, output_folder, reads_n, reads_q, read_len, sv_size, jobs, max_read_ids, bgzip, force,
+                       stats_json, sort_buffer, shard_by_chrom)
     elif analysis == 'svdetect':
-        svdetect2svfilter(input_folder, reads_n)
+        svdetect2svfilter(input_folder, reads_n, output_folder or '.', bgzip=bgzip, force=force, stats_json=stats_json, sort_buffer=sort_buffer,
+                          shard_by_chrom=shard_by_chrom)
+    elif analysis == 'compare':
+        compare_sv_calls(input_folder, svdetect_folder, output_file, overlap, window)
+    if profile:
+        profiler.disable()
+        profiler.dump_stats(profile)
+        # stdout carries the svfilter rows with -i -
+        stream = sys.stderr if input_folder == '-' else sys.stdout
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(20)
 
 
-Parser()
+if __name__ == '__main__':
+    Parser()
@@ -0,0 +1,261 @@
+#!/usr/bin/python
+import argparse
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+"""
+This script require python3 to run.
+This script is to generate synthetic pindel and svdetect original output files and to benchmark 2svfilter.py on them!
+
+generate writes seeded pindel _D, _INV, _SI and _TD files and svdetect links.filtered files.
+run converts every pindel SV type and every svdetect SV type on its own in a child process and reports records/sec,
+MB/sec and peak RSS. With the default generation parameters the outputs are checked against benchmark_golden.json,
+so a change to the converters that alters their output is caught without real sequencing data.
+"""
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '2svfilter.py')
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_golden.json')
+PINDEL_TYPES = (('_D', 'D'), ('_INV', 'INV'), ('_SI', 'I'), ('_TD', 'TD'))
+SVDETECT_TYPES = ('DELETION', 'INVERSION', 'LARGE_DUPLI', 'INV_DUPLI', 'DUPLICATION', 'TRANSLOC', 'SMALL_DUPLI', 'INV_TRANSLOC')
+DEFAULTS = {'seed': 1, 'events': 2000, 'reads': 8, 'size_mb': 0, 'links': 20000}
+BASES = 'ACGT'
+
+
+class Parser():
+
+    def __init__(self):
+        parser = argparse.ArgumentParser(
+            description='Generate synthetic SV caller outputs and benchmark 2svfilter.py on them',
+            usage='''python3 benchmark.py <command> [options]
+
+Command:  generate\tWrite synthetic pindel and svdetect original output files
+\t  run\tBenchmark the pindel and svdetect converters per SV type and check their outputs
+'''
+        )
+        parser.add_argument('command', help='Command to run', nargs='?')
+        args = parser.parse_args(sys.argv[1:2])
+        if not args.command or not hasattr(self, args.command):
+            print()
+            parser.print_usage()
+            print()
+            exit(1)
+        getattr(self, args.command)()
+
+    @staticmethod
+    def add_generation_arguments(parser):
+        parser.add_argument('--seed', '-r',
+                            help='seed of the random generator', nargs='?', const=DEFAULTS['seed'], default=DEFAULTS['seed'], type=int)
+        parser.add_argument('--events', '-e',
+                            help='number of events per pindel file', nargs='?', const=DEFAULTS['events'], default=DEFAULTS['events'], type=int)
+        parser.add_argument('--reads', '-c',
+                            help='mean number of supporting reads per pindel event', nargs='?', const=DEFAULTS['reads'], default=DEFAULTS['reads'], type=int)
+        parser.add_argument('--size-mb', '-m',
+                            help='write pindel files of about this size instead of a number of events', nargs='?', const=100, default=DEFAULTS['size_mb'], type=float)
+        parser.add_argument('--links', '-k',
+                            help='number of links per svdetect file', nargs='?', const=DEFAULTS['links'], default=DEFAULTS['links'], type=int)
+
+    def generate(self):
+        parser = argparse.ArgumentParser(
+            description='Write synthetic pindel and svdetect original output files',
+            usage='''python3 benchmark.py generate -o output_folder [-r] [-e] [-c] [-m] [-k]
+
+Options:  -o\t--output-folder\tPath to write the files into
+\t  -r\t--seed\tseed of the random generator
+\t  -e\t--events\tnumber of events per pindel file
+\t  -c\t--reads\tmean number of supporting reads per pindel event
+\t  -m\t--size-mb\twrite pindel files of about this size instead of a number of events
+\t  -k\t--links\tnumber of links per svdetect file
+''')
+        parser.add_argument('--output-folder', '-o',
+                            help='Path to write the files into')
+        self.add_generation_arguments(parser)
+        args = parser.parse_args(sys.argv[2:])
+        if not args.output_folder:
+            print('\nError: no output folder specified\n')
+            parser.print_usage()
+            print()
+            exit(1)
+        os.makedirs(args.output_folder, exist_ok=True)
+        for sex in ('male', 'female'):
+            for suffix, code in PINDEL_TYPES:
+                events = generate_pindel(os.path.join(args.output_folder, sex + suffix), code, args.seed, args.events,
+                                         args.reads, args.size_mb)
+                print('{}\t{}'.format(sex + suffix, events))
+            generate_svdetect(os.path.join(args.output_folder, sex + '.links.filtered'), SVDETECT_TYPES, args.seed, args.links)
+            print('{}\t{}'.format(sex + '.links.filtered', args.links))
+
+    def run(self):
+        parser = argparse.ArgumentParser(
+            description='Benchmark the pindel and svdetect converters per SV type and check their outputs',
+            usage='''python3 benchmark.py run [-r] [-e] [-c] [-m] [-k] [-a] [-s] [-u]
+
+Options:  -r\t--seed\tseed of the random generator
+\t  -e\t--events\tnumber of events per pindel file
+\t  -c\t--reads\tmean number of supporting reads per pindel event
+\t  -m\t--size-mb\twrite pindel files of about this size instead of a number of events
+\t  -k\t--links\tnumber of links per svdetect file
+\t  -a\t--pindel-args\textra options for the pindel command, e.g. "-j 4 -m"
+\t  -s\t--script\tthe 2svfilter.py to benchmark, default the one next to this script
+\t  -u\t--update-golden\tstore the outputs of this run as the golden result
+''')
+        self.add_generation_arguments(parser)
+        parser.add_argument('--pindel-args', '-a',
+                            help='extra options for the pindel command', default='')
+        parser.add_argument('--script', '-s',
+                            help='the 2svfilter.py to benchmark, default the one next to this script', default=SCRIPT)
+        parser.add_argument('--update-golden', '-u',
+                            help='store the outputs of this run as the golden result', action='store_true')
+        args = parser.parse_args(sys.argv[2:])
+        params = {'seed': args.seed, 'events': args.events, 'reads': args.reads, 'size_mb': args.size_mb, 'links': args.links}
+        exit(benchmark(params, args.pindel_args.split(), args.update_golden, os.path.abspath(args.script)))
+
+
+def random_seq(rand, length):
+    return ''.join(rand.choice(BASES) for _ in range(length))
+
+
+def generate_pindel(path, code, seed, events, reads, size_mb=0):
+    """Write a pindel file of one SV type, return the number of events written.
+
+    With size_mb events are written until the file reaches that size.
+    """
+    rand = random.Random('{}:{}'.format(seed, os.path.basename(path)))
+    limit = size_mb * 1024 * 1024
+    written = 0
+    pos = 1000
+    chrom = 1
+    with open(path, 'w') as file:
+        while (written < events) if not limit else (file.tell() < limit):
+            if rand.random() < 0.001:
+                chrom += 1
+                pos = 1000
+            pos += rand.randint(50, 5000)
+            size = rand.randint(1, 1000) if code != 'I' else rand.randint(1, 60)
+            nt = random_seq(rand, size) if code == 'I' else ''
+            supports = []
+            for i in range(rand.randint(0, 2 * reads)):
+                supports.append((rand.choice('+-'), pos + rand.randint(-400, 400), rand.choice((0, 3, 10, 20, 29, 37, 60)),
+                                 '@{}_{}_{}/{}'.format(code, written, i, rand.randint(1, 2))))
+            up = sum(1 for strand, *_ in supports if strand == '+')
+            down = len(supports) - up
+            file.write('#' * 100 + '\n')
+            file.write('{}\t{} {}\tNT {} "{}"\tChrID chr{}\tBP {}\t{}\tBP_range {}\t{}\tSupports {}\t{}\t+ {}\t{}\t- {}\t{}\t'
+                       'S1 {}\tSUM_MS {}\t1\tNumSupSamples 1\t1\tsample {} {} {} {}\n'.format(
+                           written, code, size, len(nt), nt, chrom, pos, pos + size + 1, pos, pos + size + 3,
+                           len(supports), len(supports), up, up, down, down, len(supports) * 2 + 1, len(supports) * 40,
+                           up, up, down, down))
+            file.write(random_seq(rand, 40) + size % 30 * 'n' + random_seq(rand, 40) + '\n')
+            for strand, read_pos, mapq, name in supports:
+                pad = ' ' * rand.randint(0, 60)
+                if code == 'TD':
+                    file.write(pad + random_seq(rand, 30) + '\n')
+                    file.write(pad + '\t{}\t{}\t{}\tsample\t{}\n'.format(strand, read_pos, mapq, name))
+                elif code == 'D' and rand.random() < 0.5:
+                    # read split by the deletion
+                    file.write(pad + random_seq(rand, 20) + ' ' * (size % 50 + 1) + random_seq(rand, 20) +
+                               '\t{}\t{}\t{}\tsample\t{}\n'.format(strand, read_pos, mapq, name))
+                else:
+                    file.write(pad + random_seq(rand, 40) + '\t{}\t{}\t{}\tsample\t{}\n'.format(strand, read_pos, mapq, name))
+            written += 1
+        file.write('#' * 100 + '\n')
+    return written
+
+
+def generate_svdetect(path, svtypes, seed, links):
+    """Write a svdetect links.filtered file with links of the given SV types."""
+    rand = random.Random('{}:{}:{}'.format(seed, os.path.basename(path), ','.join(svtypes)))
+    with open(path, 'w') as file:
+        for i in range(links):
+            chrom = 'chr{}'.format(rand.randint(1, 5))
+            other = chrom if rand.random() < 0.9 else 'chr{}'.format(rand.randint(1, 5))
+            start = rand.randint(1, 10 ** 7)
+            other_start = start + rand.randint(300, 10 ** 5)
+            pairs = rand.randint(1, 25)
+            both = rand.randint(0, pairs)
+            file.write('\t'.join((chrom, str(start), str(start + 400), other, str(other_start), str(other_start + 400), str(pairs),
+                                  '(' + ','.join('pair{}_{}'.format(i, j) for j in range(min(pairs, 5))) + ')',
+                                  rand.choice(('(R,F)', '(F,R)', '(R,R)', '(F,F)')), '(1,2)', '0', '0', '0', '0', '0', '0',
+                                  rand.choice(svtypes), '{}/{}'.format(both, pairs), '{}/{}'.format(pairs - both, pairs),
+                                  '{:.2f}'.format(rand.random()))) + '\n')
+
+
+def run_child(command, cwd=None):
+    """Run a command, return (wall seconds, peak RSS in MB) of the child process."""
+    start = time.perf_counter()
+    child = subprocess.Popen(command, stdout=subprocess.DEVNULL, cwd=cwd)
+    _, status, usage = os.wait4(child.pid, 0)
+    wall = time.perf_counter() - start
+    child.returncode = os.waitstatus_to_exitcode(status)
+    if child.returncode != 0:
+        raise RuntimeError('{} exited with {}'.format(' '.join(command), child.returncode))
+    # ru_maxrss is in KB on Linux
+    return wall, usage.ru_maxrss / 1024
+
+
+def digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def benchmark(params, pindel_args, update_golden, script=SCRIPT):
+    rows = []
+    outputs = {}
+    with tempfile.TemporaryDirectory(prefix='2svfilter_bench_') as temp:
+        for suffix, code in PINDEL_TYPES:
+            folder = os.path.join(temp, 'pindel' + suffix)
+            os.mkdir(folder)
+            path = os.path.join(folder, 'male' + suffix)
+            events = generate_pindel(path, code, params['seed'], params['events'], params['reads'], params['size_mb'])
+            size = os.stat(path).st_size
+            wall, rss = run_child([sys.executable, script, 'pindel', '-i', folder] + pindel_args)
+            rows.append(('pindel', suffix[1:], events, size, wall, rss))
+            for name in sorted(os.listdir(folder)):
+                if name.endswith(('.filter', '.bed')):
+                    outputs['pindel/' + name] = digest(os.path.join(folder, name))
+        for svtype in SVDETECT_TYPES:
+            folder = os.path.join(temp, 'svdetect_' + svtype)
+            out = os.path.join(folder, 'out')
+            os.makedirs(out)
+            path = os.path.join(folder, 'male.links.filtered')
+            generate_svdetect(path, (svtype,), params['seed'], params['links'])
+            size = os.stat(path).st_size
+            # svdetect writes into the working directory; older versions of it join input_folder + filename
+            wall, rss = run_child([sys.executable, script, 'svdetect', '-i', folder + os.sep], cwd=out)
+            rows.append(('svdetect', svtype, params['links'], size, wall, rss))
+            for name in sorted(os.listdir(out)):
+                # older versions write every svdetect_<type> file, also the empty ones
+                if name.startswith('svdetect_') and os.stat(os.path.join(out, name)).st_size:
+                    outputs['svdetect/' + name] = digest(os.path.join(out, name))
+    print('converter\tsvtype\trecords\tMB\tseconds\trecords/sec\tMB/sec\tpeak RSS MB')
+    for converter, svtype, records, size, wall, rss in rows:
+        mb = size / 1024 / 1024
+        print('{}\t{}\t{}\t{:.1f}\t{:.2f}\t{:.0f}\t{:.1f}\t{:.1f}'.format(converter, svtype, records, mb, wall,
+                                                                         records / wall, mb / wall, rss))
+    if update_golden:
+        with open(GOLDEN, 'w') as file:
+            json.dump({'params': params, 'outputs': outputs}, file, indent=1, sort_keys=True)
+            file.write('\n')
+        print('golden result updated')
+        return 0
+    with open(GOLDEN, 'r') as file:
+        golden = json.load(file)
+    if golden['params'] != params:
+        print('golden check skipped, it was stored for {}'.format(golden['params']))
+        return 0
+    differ = sorted(name for name in set(golden['outputs']) | set(outputs) if golden['outputs'].get(name) != outputs.get(name))
+    for name in differ:
+        print('golden mismatch: {}'.format(name))
+    print('golden check {}'.format('failed' if differ else 'passed'))
+    return 1 if differ else 0
+
+
+if __name__ == '__main__':
+    Parser()